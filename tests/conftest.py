@@ -0,0 +1,29 @@
+'''Fixtures of the tests: the xmit files of xmitgen.ARCHIVES
+'''
+from collections import namedtuple
+
+import pytest
+
+import xmitgen
+
+# an xmit file written for the tests with the members it was built from
+Archive = namedtuple('Archive', 'kind path members dcb')
+
+@pytest.fixture(scope='session')
+def archives(tmp_path_factory):
+    '''Dictionary kind: Archive of all kinds in xmitgen.ARCHIVES
+    '''
+    directory = tmp_path_factory.mktemp('archives')
+    result = {}
+    for (kind, (get_members, dcb)) in xmitgen.ARCHIVES.items():
+        members = get_members()
+        path = directory / (kind + '.xmi')
+        path.write_bytes(xmitgen.build_xmit(members, **dcb))
+        result[kind] = Archive(kind, path, members, dcb)
+    return result
+
+@pytest.fixture(params=sorted(xmitgen.ARCHIVES))
+def archive(request, archives):
+    '''each Archive of archives in turn
+    '''
+    return archives[request.param]
@@ -0,0 +1,80 @@
+'''Data type and code page guessed from a sample of member data,
+compared with the first version of get_type().
+'''
+import random
+import string
+
+import pytest
+
+import xmitviewer.utils.datatype as datatype
+
+_PRINTABLE = set(' ').union(
+    string.punctuation, string.ascii_letters, string.digits)
+_SUSPECTS = {chr(i) for i in range(256)}.difference(_PRINTABLE)
+
+def reference_type(the_bytes):
+    '''get_type() of the first version, decoding the whole sample
+    '''
+    def check_codepage(codepage):
+        text = the_bytes.decode(codepage, errors='replace')
+        return len([s for s in text if s in _SUSPECTS]) * 100 // \
+            len(the_bytes)
+    if check_codepage('cp273') < 2:
+        return 'ebcdic'
+    if check_codepage('latin-1') < 2:
+        return 'ascii'
+    if the_bytes[2:8] == 'INMR01'.encode('cp273'):
+        return 'xmit'
+    if the_bytes.find(b'%PDF') >= 0:
+        return 'pdf'
+    if the_bytes[0:2] == b'PK':
+        return 'zip'
+    if the_bytes[1:5] == 'ESD '.encode('cp273'):
+        return 'obj'
+    return 'bin'
+
+def samples():
+    '''samples of all data types, some of them at the limits
+    '''
+    rnd = random.Random(0)
+    text = '//STEP1 EXEC PGM=IEFBR14,PARM=\'A-Z 0-9\' * COMMENT'.ljust(80)
+    result = [
+        text.encode('cp273'), text.encode('cp037'), text.encode('latin-1'),
+        'ÄÖÜ äöü ß {} [] !'.ljust(80).encode('cp273'),
+        'ÄÖÜ äöü ß {} [] !'.ljust(80).encode('cp037'),
+        b'\x00' + text.encode('cp273')[1:],   # 1 suspect of 80
+        b'\x00\x00' + text.encode('cp273')[2:],
+        b'%PDF-1.4' + bytes(range(256)), b'PK\x03\x04' + bytes(range(256)),
+        b'\x02\xc5\xe2\xc4\x40' + bytes(range(256)),
+        b'\x00\x00' + 'INMR01'.encode('cp273') + bytes(range(256)),
+        bytes(range(256)) * 3, b'\x00' * 400, b' ', b'\x40',
+    ]
+    result.extend(
+        bytes(rnd.choice(range(256)) for _ in range(rnd.randint(1, 400)))
+        for _ in range(50))
+    return result
+
+@pytest.mark.parametrize('sample', samples())
+def test_classify(sample):
+    (the_type, codepage) = datatype.classify(sample)
+    assert the_type == reference_type(sample) == datatype.get_type(sample)
+    if the_type == 'ebcdic':
+        assert codepage == datatype.classify_codepage(
+            sample, datatype.EBCDIC_CODEPAGES)[0]
+    else:
+        assert codepage is None
+
+def test_classify_samples():
+    assert datatype.classify_samples(samples()) == [
+        datatype.classify(sample) for sample in samples()]
+    assert datatype.classify_samples([]) == []
+
+def test_code_page():
+    text = '//* Größe'.ljust(160)  # few national letters in a text
+    assert datatype.classify(text.encode('cp273')) == ('ebcdic', 'cp273')
+    assert datatype.classify(text.encode('cp037')) == ('ebcdic', 'cp037')
+
+def test_empty():
+    assert datatype.classify(b'') == ('empty', None)
+    assert datatype.classify_samples([b'', b' ']) == [
+        ('empty', None), datatype.classify(b' ')]
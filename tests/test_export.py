@@ -0,0 +1,133 @@
+'''Export of the members into a directory and into tar, zip and NDJSON
+files, and the differences between two versions of a pds.
+'''
+import base64
+import datetime
+import json
+import tarfile
+import zipfile
+
+import pytest
+
+import xmitgen
+from xmitviewer.xmit.file import Xmitfile
+from xmitviewer.iebcopy.export import (
+    export_members, export_to_sink, open_sink, get_mtime)
+from xmitviewer.iebcopy.pdsdiff import diff_pds
+
+def expected_files(archive):
+    '''Dictionary file name: content of the exported members
+    '''
+    by_name = {member[0]: member for member in archive.members}
+    files = {}
+    for (name, blocks, _, alias_of) in archive.members:
+        blocks = by_name[alias_of][1] if alias_of else blocks
+        if not blocks:
+            continue
+        data = b''.join(blocks)
+        if archive.kind == 'u':
+            files[name + '.lmod'] = data
+        elif name == 'BINARY':
+            files[name + '.bin'] = data
+        else:
+            files[name + '.txt'] = ''.join(
+                record.decode('cp037') + '\n'
+                for record in records(data, archive)).encode('utf-8')
+    return files
+
+def records(data, archive):
+    '''the records of the joined blocks data of archive (FB or VB)
+    '''
+    if archive.kind == 'fb':
+        lrecl = archive.dcb['lrecl']
+        return [data[i: i + lrecl] for i in range(0, len(data), lrecl)]
+    result = []
+    pos = 0
+    while pos < len(data):
+        (i, end) = (pos + 4, pos + int.from_bytes(data[pos: pos + 2], 'big'))
+        while i < end:
+            length = int.from_bytes(data[i: i + 2], 'big')
+            result.append(data[i + 4: i + length])
+            i += length
+        pos = end
+    return result
+
+def test_export_members(archive, tmp_path):
+    with Xmitfile(str(archive.path)) as xmit:
+        results = list(export_members(
+            xmit.get_pds(), outdir=str(tmp_path), workers=2))
+    expected = expected_files(archive)
+    assert {path.name: path.read_bytes()
+            for path in tmp_path.iterdir()} == expected
+    assert sorted(result.name for result in results if result.error) == (
+        ['EMPTY'] if archive.kind == 'fb' else [])
+
+@pytest.mark.parametrize('suffix', ['tar', 'tar.gz', 'zip', 'ndjson'])
+def test_sinks(archive, tmp_path, suffix):
+    path = tmp_path / ('export.' + suffix)
+    with Xmitfile(str(archive.path)) as xmit:
+        with open_sink(path) as sink:
+            results = list(export_to_sink(xmit.get_pds(), sink))
+    assert all(result.error is None for result in results)
+    expected = expected_files(archive)
+    if suffix.startswith('tar'):
+        with tarfile.open(path) as archive_file:
+            found = {info.name: archive_file.extractfile(info).read()
+                     for info in archive_file.getmembers()}
+            links = {info.name for info in archive_file.getmembers()
+                     if info.islnk()}
+        assert links == {name for name in expected
+                         if name.startswith(('ALIAS', 'PGMALI'))}
+    elif suffix == 'zip':
+        with zipfile.ZipFile(path) as archive_file:
+            found = {name: archive_file.read(name)
+                     for name in archive_file.namelist()}
+    else:
+        found = {}
+        for line in path.read_text(encoding='utf-8').splitlines():
+            entry = json.loads(line)
+            data = entry['text'].encode('utf-8') if 'text' in entry \
+                else base64.b64decode(entry['data'])
+            ext = 'txt' if entry['datatype'] == 'ebcdic' \
+                else entry['datatype']
+            for name in [entry['name']] + entry['aliases']:
+                found[name + '.' + ext] = data
+    assert found == expected
+
+def test_mtime(archives):
+    with Xmitfile(str(archives['fb'].path)) as xmit:
+        pds = xmit.get_pds()
+        mtime = get_mtime(pds.mbrname_to_mbr['MEM02'])
+        assert datetime.datetime.fromtimestamp(mtime) == \
+            datetime.datetime(2020, 4, 11, 10, 20)
+        assert get_mtime(pds.mbrname_to_mbr['BINARY']) is None
+
+def test_diff(archives, tmp_path):
+    members = xmitgen.fb_members()
+    by_name = {member[0]: member for member in members}
+    lines = xmitgen.text_lines(19, seed=2)
+    lines[5] = 'CHANGED'.ljust(80)
+    by_name['MEM02'] = ('MEM02', xmitgen.text_blocks(lines),
+                        by_name['MEM02'][2], None)
+    by_name['REN04'] = ('REN04', ) + by_name.pop('MEM04')[1:]
+    by_name['MEM05'] = by_name['MEM05'][:2] + (
+        xmitgen.ispf_stats(40, day=200), None)
+    del by_name['MEM03']
+    by_name['NEWMEM'] = ('NEWMEM', xmitgen.text_blocks(['NEW'.ljust(80)]),
+                         xmitgen.ispf_stats(1), None)
+    path = tmp_path / 'new.xmi'
+    path.write_bytes(xmitgen.build_xmit(list(by_name.values())))
+    with Xmitfile(str(archives['fb'].path)) as old, \
+            Xmitfile(str(path)) as new:
+        differences = diff_pds(old.get_pds(), new.get_pds(), with_lines=True)
+    assert [(difference.kind, difference.name, difference.new_name)
+            for difference in differences] == [
+                ('added', 'NEWMEM', 'NEWMEM'),
+                ('removed', 'MEM03', None),
+                ('renamed', 'MEM04', 'REN04'),
+                ('changed', 'MEM02', 'MEM02'),
+                ('stats', 'MEM05', 'MEM05')]
+    changed = differences[3].lines
+    assert [line for line in changed if line[0] in '+-'][2:] == [
+        '-' + xmitgen.text_lines(19, seed=2)[5].rstrip() + '\n',
+        '+CHANGED\n']
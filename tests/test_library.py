@@ -0,0 +1,167 @@
+'''Catalog, content search and text index of a library of xmit files
+'''
+import os
+import shutil
+from array import array
+
+import pytest
+
+import xmitgen
+from xmitviewer.xmit.file import Xmitfile
+from xmitviewer.library.catalog import Catalog, scan_archive
+from xmitviewer.library.search import Searcher, search_files
+from xmitviewer.library.textindex import (
+    MEMBERS_TYPE, Textindex, members_to_bytes, bytes_to_members)
+from xmitviewer.iebcopy.directory import LAST_NAME
+from xmitviewer.utils.errors import NodataError
+
+@pytest.fixture
+def library(archives, tmp_path):
+    '''directory with a copy of each archive
+    '''
+    directory = tmp_path / 'library'
+    directory.mkdir()
+    for archive in archives.values():
+        shutil.copy(archive.path, directory)
+    return directory
+
+def grep(searcher, path):
+    '''the matches of searcher in the xmit file path, searched
+    line by line without the search over all lines of a member
+    '''
+    searcher.lines_re = None
+    return searcher.search_file(str(path)).matches
+
+def test_scan_archive(archive):
+    (result, datasets, members) = scan_archive(str(archive.path))
+    assert result['error'] is None
+    assert [dataset[2] for dataset in datasets] == ['IEBCOPY', 'INMCOPY']
+    assert datasets[0][1:5] == ('HLQ.TEST.PDS', 'IEBCOPY') + tuple(
+        archive.dcb[key] for key in ('recfm', 'lrecl'))
+    with Xmitfile(str(archive.path)) as xmit:
+        pds = xmit.get_pds()
+        expected = {}
+        for mbr in pds.members:
+            if mbr.name == LAST_NAME:
+                continue
+            try:
+                memberdata = pds.build_memberdata(mbr)
+                expected[mbr.name.strip()] = (
+                    memberdata.datatype, memberdata.size)
+            except NodataError:
+                expected[mbr.name.strip()] = ('empty', 0)
+    assert {row[1]: (row[11], row[12]) for row in members} == expected
+
+def test_catalog(library, tmp_path):
+    catalog = Catalog(tmp_path / 'catalog.db')
+    assert catalog.update([str(library)], workers=1) == 3
+    hits = catalog.query(member='MEM0*')
+    assert [hit.name for hit in hits] == ['MEM%02d' % i for i in range(10)]
+    assert {hit.datatype for hit in hits} == {'ebcdic'}
+    assert catalog.query(member='MEM01')[0].size == len(
+        b''.join(xmitgen.text_blocks(xmitgen.text_lines(12, seed=1))))
+    assert [hit.name for hit in catalog.query(datatype='lmod')] == [
+        'PGM0', 'PGM1', 'PGM2', 'PGM3', 'PGMALI']
+    assert [hit.name for hit in catalog.query(
+        member='MEM*', changed_after='2020-04-15')] == [
+            'MEM%02d' % i for i in range(7, 12)]
+    # unchanged files are not scanned again
+    assert catalog.update([str(library)], workers=1) == 0
+    os.remove(library / 'u.xmi')
+    assert catalog.update([str(library)], workers=1) == 0
+    assert catalog.query(datatype='lmod') == []
+    catalog.close()
+
+def test_catalog_errors(library, tmp_path):
+    (library / 'broken.xmi').symlink_to(tmp_path / 'missing.xmi')
+    (library / 'other.txt').write_bytes(b'no xmit file')
+    catalog = Catalog(tmp_path / 'catalog.db')
+    errors = {}
+    def progress(path, error):
+        errors[os.path.basename(path)] = error
+    assert catalog.update([str(library)], workers=1, progress=progress) == 5
+    assert errors['broken.xmi'].startswith('FileNotFoundError')
+    assert errors['other.txt'].startswith('XmitfileError')
+    assert errors['fb.xmi'] is None
+    catalog.close()
+
+@pytest.mark.parametrize('pattern, kind', [
+    ('LINE 00003', 'fb'), (r'ABC *\Z', 'fb'), (r'\ALINE 0000[12]', 'fb'),
+    (r'ABC(?! *ABC)', 'fb'), (r'(?<=LINE )0001\d', 'fb'),
+    (r'^LINE 0000\d ', 'fb'), (r'(?i)line 0000[5-7]', 'fb'),
+    (r'REC 1\b', 'vb'), (r'\AREC 1', 'vb'), (r'X\Z', 'vb'),
+    ('X{30}', 'vb'), (r'X{30}(?!X)', 'vb')])
+def test_search(archive, pattern, kind):
+    searcher = Searcher(pattern, binary=False)
+    with Xmitfile(str(archive.path)) as xmit:
+        matches = list(searcher.search_pds(xmit.get_pds(), str(archive.path)))
+    assert matches == grep(Searcher(pattern, binary=False), archive.path)
+    assert bool(matches) == (archive.kind == kind)
+
+@pytest.mark.parametrize('pattern', [
+    r'X(?!\s)', r'X\Z', r'\AB', r'(?<!\s)B', r'(?m:X$)', 'B'])
+def test_search_line_ends(tmp_path, pattern):
+    path = tmp_path / 'lines.xmi'
+    path.write_bytes(xmitgen.build_xmit(
+        [('LINES', xmitgen.vb_blocks(['A X', 'B']), b'', None)],
+        recfm='VB', lrecl=255, blksize=300))
+    with Xmitfile(str(path)) as xmit:
+        matches = list(Searcher(pattern).search_pds(xmit.get_pds()))
+    assert [(match.line, match.text) for match in matches] == [
+        (1, 'A X') if 'X' in pattern else (2, 'B')]
+
+def test_search_literal(archives):
+    searcher = Searcher('PGM1', literal=True)
+    result = searcher.search_file(str(archives['u'].path))
+    assert result.error is None and result.matches == []
+    searcher = Searcher('\x01' * 300, literal=True)
+    matches = searcher.search_file(str(archives['u'].path)).matches
+    assert [(match.member, match.line, match.column)
+            for match in matches] == [
+                ('PGM%d' % i, None, 400) for i in range(4)]
+
+def test_search_files(library):
+    searcher = Searcher('LINE 00010', literal=True)
+    results = sorted(search_files(searcher, [str(library)], workers=1))
+    assert [os.path.basename(result.path) for result in results] == [
+        'fb.xmi', 'u.xmi', 'vb.xmi']
+    assert [len(result.matches) for result in results] == [11, 0, 0]
+    assert all(result.error is None for result in results)
+
+def test_textindex(library, tmp_path):
+    index = Textindex(tmp_path / 'text.db')
+    assert index.update([str(library)], workers=1) == 3
+    for (pattern, text) in (('LINE 00010', None), ('REC 1[0-9]', 'REC 1'),
+                            ('X{30}', None)):
+        searcher = Searcher(pattern, literal=text is None and
+                            '{' not in pattern)
+        expected = [
+            match for name in ('fb.xmi', 'vb.xmi')
+            for match in grep(Searcher(pattern, literal=searcher.literal),
+                              library / name)]
+        assert expected
+        assert list(index.search(searcher, text)) == expected
+    assert index.update([str(library)], workers=1) == 0
+    index.close()
+
+def test_textindex_stale(library, tmp_path):
+    index = Textindex(tmp_path / 'text.db')
+    index.update([str(library)], workers=1)
+    searcher = Searcher('LINE 00003', literal=True)
+    assert list(index.search(searcher))
+    with open(library / 'fb.xmi', 'ab') as xmit_file:
+        xmit_file.write(b'\x00')
+    stale = []
+    assert list(index.search(
+        searcher, stale=lambda path, reason: stale.append(path))) == []
+    assert stale == [str(library / 'fb.xmi')]
+    index.update([str(library)], workers=1)
+    assert list(index.search(searcher))
+    index.close()
+
+def test_members_bytes():
+    numbers = array(MEMBERS_TYPE, [0, 1, 255, 256, 70000, 2 ** 32 - 1])
+    the_bytes = members_to_bytes(numbers)
+    assert the_bytes[:8] == b'\x00\x00\x00\x00\x01\x00\x00\x00'
+    assert len(the_bytes) == 4 * len(numbers)
+    assert bytes_to_members(the_bytes) == numbers
@@ -0,0 +1,243 @@
+'''Members of the pds in a xmit file: directory, data, records, data types,
+statistics and the index cache, compared with the data the archives were
+built from and with the unblocking of the first version of Memberdata.
+'''
+import struct
+import threading
+
+import pytest
+
+import xmitgen
+from xmitviewer.xmit.file import Xmitfile
+from xmitviewer.iebcopy.iebcopyds import Iebcopyds
+from xmitviewer.iebcopy.directory import LAST_NAME
+from xmitviewer.utils.errors import NodataError
+
+def reference_records(the_bytes, recfm, lrecl):
+    '''the records of the_bytes as unblocked by the first version
+    of Memberdata.get_as_records()
+    '''
+    if recfm == 'FB':
+        return [the_bytes[i: i + lrecl]
+                for i in range(0, len(the_bytes), lrecl)]
+    if recfm != 'VB':
+        return [the_bytes]
+    records = []
+    j = 0
+    while True:
+        (lblock, _) = struct.unpack('>2H', the_bytes[j: j + 4])
+        (i, j) = (j + 4, j + lblock)
+        while i < j:
+            (length, _) = struct.unpack('>2H', the_bytes[i: i + 4])
+            records.append(the_bytes[i + 4: i + length])
+            i += length
+        if j > len(the_bytes) - 4:
+            return records
+
+def data_members(archive):
+    '''names of the members (and aliases) with data
+    '''
+    by_name = {member[0]: member for member in archive.members}
+    return sorted(
+        name for (name, blocks, _, alias_of) in archive.members
+        if blocks or (alias_of and by_name[alias_of][1]))
+
+def test_directory(archive):
+    with Xmitfile(str(archive.path)) as xmit:
+        pds = xmit.get_pds()
+        members = [mbr for mbr in pds.members if mbr.name != LAST_NAME]
+        assert [mbr.name.strip() for mbr in members] == sorted(
+            (member[0] for member in archive.members),
+            key=xmitgen.ebcdic)
+        assert {mbr.name.strip() for mbr in members if mbr.alias} == {
+            member[0] for member in archive.members if member[3]}
+        assert len(pds.mbrname_to_mbr) == len(pds.members)
+        assert list(pds.mbrname_to_mbr) == [mbr.name for mbr in pds.members]
+
+def test_member_data(archive):
+    (recfm, lrecl) = (archive.dcb['recfm'], archive.dcb['lrecl'])
+    with Xmitfile(str(archive.path)) as xmit:
+        pds = xmit.get_pds()
+        for name in data_members(archive):
+            data = xmitgen.get_data(archive.members, name)
+            memberdata = pds.get_memberdata(name)
+            assert memberdata.the_bytes == data
+            assert memberdata.size == len(data)
+            records = reference_records(data, recfm, lrecl)
+            assert list(memberdata.get_as_records(codepage=None)) == records
+            if recfm == 'U':    # the bytes also with a code page
+                assert list(memberdata.get_as_records()) == records
+            else:
+                lines = [str(record, 'cp273') for record in records]
+                assert list(memberdata.get_as_records()) == lines
+                assert memberdata.get_lines() == lines
+                assert memberdata.get_text() == ''.join(
+                    line + '\n' for line in lines)
+
+def test_record_index(archive):
+    (recfm, lrecl) = (archive.dcb['recfm'], archive.dcb['lrecl'])
+    with Xmitfile(str(archive.path)) as xmit:
+        pds = xmit.get_pds()
+        for name in data_members(archive):
+            records = reference_records(
+                xmitgen.get_data(archive.members, name), recfm, lrecl)
+            memberdata = pds.get_memberdata(name)
+            assert memberdata.count_records() == len(records)
+            assert memberdata.get_record(0, codepage=None) == records[0]
+            assert memberdata.get_record(-1, codepage=None) == records[-1]
+            assert memberdata.get_records(1, 4, codepage=None) == records[1:4]
+            with pytest.raises(IndexError):
+                memberdata.get_record(len(records))
+
+def test_sizes(archive):
+    (recfm, lrecl) = (archive.dcb['recfm'], archive.dcb['lrecl'])
+    by_name = {member[0]: member for member in archive.members}
+    with Xmitfile(str(archive.path)) as xmit:
+        pds = xmit.get_pds()
+        for (name, blocks, _, alias_of) in archive.members:
+            mbr = pds.mbrname_to_mbr[name]
+            blocks = by_name[alias_of][1] if alias_of else blocks
+            if not blocks:
+                assert mbr.sizes is None
+                continue
+            data = b''.join(blocks)
+            records = len(reference_records(data, recfm, lrecl)) \
+                if recfm != 'U' else None
+            assert tuple(mbr.sizes) == (len(data), len(blocks), records)
+
+def test_empty_and_missing(archives):
+    with Xmitfile(str(archives['fb'].path)) as xmit:
+        pds = xmit.get_pds()
+        with pytest.raises(NodataError):
+            pds.get_memberdata('EMPTY')
+        with pytest.raises(KeyError):
+            pds.get_memberdata('NOTHERE')
+
+def test_aliases(archives):
+    with Xmitfile(str(archives['u'].path)) as xmit:
+        pds = xmit.get_pds()
+        member = pds.mbrname_to_mbr['PGM1']
+        alias = pds.mbrname_to_mbr['PGMALI']
+        assert [mbr.name.strip() for mbr in member.aliases] == ['PGMALI']
+        assert alias.alias and alias.mbbcchhr == member.mbbcchhr
+        assert pds.addr_to_mbr[member.mbbcchhr] is member
+        assert pds.get_memberdata('PGMALI').the_bytes == \
+            pds.get_memberdata('PGM1').the_bytes
+
+def test_lookups(archives):
+    with Xmitfile(str(archives['fb'].path)) as xmit:
+        pds = xmit.get_pds()
+        lookup = pds.mbrname_to_mbr
+        assert 'MEM01   ' in lookup and 'MEM99   ' not in lookup
+        assert lookup.get('MEM99   ') is None
+        assert lookup['MEM01   '] is pds.members[
+            [mbr.name for mbr in pds.members].index('MEM01   ')]
+        for (addr, mbr) in pds.addr_to_mbr.items():
+            assert mbr.mbbcchhr == addr and not mbr.alias
+
+def test_iter_members(archive):
+    with Xmitfile(str(archive.path)) as xmit:
+        pds = xmit.get_pds()
+        found = [(mbr.name.strip(), memberdata.the_bytes)
+                 for (mbr, memberdata) in pds.iter_members()]
+        assert sorted(found) == [
+            (name, xmitgen.get_data(archive.members, name))
+            for name in data_members(archive)
+            if not pds.mbrname_to_mbr[name].alias]
+
+def test_datatypes(archive):
+    with Xmitfile(str(archive.path)) as xmit:
+        pds = xmit.get_pds()
+        datatypes = pds.get_datatypes()
+        for mbr in pds.members:
+            if mbr.name == LAST_NAME:
+                continue
+            try:
+                expected = pds.build_memberdata(mbr).datatype
+            except NodataError:
+                expected = 'empty'
+            assert datatypes[mbr.name] == expected
+            assert pds.get_datatype(mbr) == expected
+    expected = {'fb': 'ebcdic', 'vb': 'ebcdic', 'u': 'lmod'}[archive.kind]
+    assert datatypes[archive.members[0][0].ljust(8)] == expected
+
+def test_fb_datatypes(archives):
+    with Xmitfile(str(archives['fb'].path)) as xmit:
+        datatypes = xmit.get_pds().get_datatypes()
+        assert (datatypes['EMPTY   '], datatypes['BINARY  ']) == \
+            ('empty', 'bin')
+
+def test_stats(archive):
+    with Xmitfile(str(archive.path)) as xmit:
+        pds = xmit.get_pds()
+        columns = pds.get_stats()
+        for (row, lines, userid) in zip(
+                columns.rows, columns.lines, columns.userid):
+            stats = pds.members[row].userdata.stats
+            assert (lines, userid) == (stats.lines, stats.userid.strip())
+        assert len(columns.rows) == sum(
+            1 for member in archive.members if len(member[2]) == 30)
+
+def test_index_cache(archive, tmp_path, monkeypatch):
+    cache = str(tmp_path)
+    with Xmitfile(str(archive.path), index_cache=cache) as xmit:
+        pds = xmit.get_pds()
+        expected = [
+            (mbr.name, mbr.sizes, memberdata.the_bytes)
+            for (mbr, memberdata) in pds.iter_members()]
+    assert list(tmp_path.iterdir())
+    # opened again, nothing is scanned
+    def no_scan(*args):
+        raise AssertionError('scanned again')
+    monkeypatch.setattr(Xmitfile, '_scan', no_scan)
+    monkeypatch.setattr(Iebcopyds, '_scan', no_scan)
+    monkeypatch.setattr(Iebcopyds, '_build_extents', no_scan)
+    with Xmitfile(str(archive.path), index_cache=cache) as xmit:
+        pds = xmit.get_pds()
+        assert [
+            (mbr.name, mbr.sizes, memberdata.the_bytes)
+            for (mbr, memberdata) in pds.iter_members()] == expected
+
+def test_fb_without_lrecl(tmp_path):
+    members = xmitgen.fb_members(3)
+    path = tmp_path / 'nolrecl.xmi'
+    path.write_bytes(xmitgen.build_xmit(members, lrecl=0))
+    with Xmitfile(str(path)) as xmit:
+        pds = xmit.get_pds()
+        datatypes = pds.get_datatypes()
+        memberdata = pds.get_memberdata('MEM01')
+        assert memberdata.count_records() == 1
+        assert list(memberdata.get_as_records(codepage=None)) == [
+            xmitgen.get_data(members, 'MEM01')]
+        assert datatypes['MEM01   '] == memberdata.datatype == 'ebcdic'
+
+def test_damaged_vb(tmp_path):
+    blocks = xmitgen.vb_blocks(xmitgen.vb_records(5))
+    # record descriptor word of the second record: length 0
+    first = struct.unpack_from('>H', blocks[0], 4)[0]
+    damaged = bytearray(blocks[0])
+    damaged[4 + first: 4 + first + 2] = b'\x00\x00'
+    path = tmp_path / 'damaged.xmi'
+    path.write_bytes(xmitgen.build_xmit(
+        [('DAMAGED', [bytes(damaged)], xmitgen.ispf_stats(5), None)],
+        recfm='VB', lrecl=255, blksize=300))
+    with Xmitfile(str(path)) as xmit:
+        memberdata = xmit.get_pds().get_memberdata('DAMAGED')
+        assert memberdata.count_records() == 1
+        assert len(list(memberdata.get_as_records())) == 1
+
+def test_members_from_threads(archives):
+    with Xmitfile(str(archives['fb'].path)) as xmit:
+        pds = xmit.get_pds()
+        found = [[], []]
+        def build(result):
+            result.extend(pds.members[i] for i in range(len(pds.members)))
+        threads = [threading.Thread(target=build, args=(result, ))
+                   for result in found]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert all(a is b for (a, b) in zip(*found))
+        assert all(mbr.sizes is not None for mbr in found[0]
+                   if mbr.name.strip() not in ('EMPTY', LAST_NAME))
@@ -0,0 +1,119 @@
+'''Reading xmit files once as a stream, also from containers, and
+reading only their control records, compared with Xmitfile.
+'''
+import bz2
+import gzip
+import io
+import lzma
+import zipfile
+
+import pytest
+
+import xmitgen
+from xmitviewer.xmit.file import Xmitfile, probe
+from xmitviewer.xmit.stream import Xmitstream, iter_file_members
+from xmitviewer.utils.errors import XmitfileError
+
+class Trickle(object):
+    '''binary stream returning at most size bytes per read, like a pipe
+    '''
+    def __init__(self, the_bytes, size=7):
+        self.stream = io.BytesIO(the_bytes)
+        self.size = size
+    def read(self, size=-1):
+        'at most self.size bytes'
+        return self.stream.read(min(size, self.size) if size >= 0
+                                else self.size)
+    def close(self):
+        'close the stream'
+        self.stream.close()
+
+def write_container(path, compression):
+    '''writes the xmit file path compressed into a container,
+    returns the path of the container
+    '''
+    data = path.read_bytes()
+    target = path.with_name(path.name + '.' + compression)
+    if compression == 'zip':
+        with zipfile.ZipFile(target, 'w') as archive:
+            archive.writestr('readme.txt', 'no xmit file')
+            archive.writestr(path.name, data)
+    else:
+        target.write_bytes({
+            'gz': gzip.compress, 'bz2': bz2.compress, 'xz': lzma.compress,
+        }[compression](data))
+    return target
+
+def read_members(members):
+    '''(name, data, names of aliases) of (member, Memberdata)
+    '''
+    return [
+        (mbr.name, memberdata.the_bytes,
+         [alias.name for alias in mbr.aliases])
+        for (mbr, memberdata) in members]
+
+def test_stream_members(archive):
+    data = archive.path.read_bytes()
+    with Xmitfile(str(archive.path)) as xmit:
+        pds = xmit.get_pds()
+        expected = {
+            mbr.name: pds.get_memberdata(mbr.name).the_bytes
+            for (mbr, _) in pds.iter_members()
+            for mbr in [mbr] + mbr.aliases}
+    xmit = Xmitstream(Trickle(data))
+    found = {mbr.name: memberdata.the_bytes
+             for (mbr, memberdata) in xmit.iter_members()}
+    assert found == expected
+    assert [crec.type for crec in xmit.controlrecords] == [
+        'INMR01', 'INMR02', 'INMR02', 'INMR03', 'INMR06']
+    with pytest.raises(XmitfileError):
+        next(xmit.iter_members())
+
+@pytest.mark.parametrize('compression', ['gz', 'bz2', 'xz', 'zip'])
+def test_container_members(archive, compression):
+    container = write_container(archive.path, compression)
+    with Xmitfile(str(archive.path)) as xmit:
+        expected = read_members(xmit.get_pds().iter_members())
+    assert read_members(iter_file_members(str(container))) == expected
+    assert read_members(iter_file_members(str(archive.path))) == expected
+    with Xmitfile(str(container)) as xmit:
+        assert read_members(xmit.get_pds().iter_members()) == expected
+
+def test_truncated_stream(archives):
+    data = archives['vb'].path.read_bytes()
+    with pytest.raises(XmitfileError):
+        list(Xmitstream(io.BytesIO(data[:len(data) // 2])).iter_members())
+
+def test_probe(archive):
+    header = probe(str(archive.path))
+    assert header.get_inmr01() == 'INMR01: NODEA.USERA - 2020-10-18'
+    assert header.datasets[0].dsn == 'HLQ.TEST.PDS'
+    assert header.datasets[0].dcb['recfm'] == archive.dcb['recfm']
+
+def test_probe_truncated(archives, tmp_path):
+    data = archives['fb'].path.read_bytes()
+    end = 0     # end of the control records
+    while data[end + 1] & 0x20:
+        end += data[end]
+    for size in (3, 50, end):
+        path = tmp_path / 'truncated.xmi'
+        path.write_bytes(data[:size])
+        with pytest.raises(XmitfileError, match='truncated control record'):
+            probe(str(path))
+
+def test_no_xmit_file(tmp_path):
+    path = tmp_path / 'other.xmi'
+    path.write_bytes(b'no xmit file')
+    with pytest.raises(XmitfileError):
+        Xmitfile(str(path))
+    with pytest.raises(XmitfileError):
+        probe(str(path))
+    with pytest.raises(XmitfileError):
+        list(Xmitstream(io.BytesIO(path.read_bytes())).iter_members())
+
+def test_close(archives):
+    with Xmitfile(str(archives['fb'].path)) as xmit:
+        mapping = xmit.mapping
+        data = xmit.get_pds().get_memberdata('MEM01').the_bytes
+    assert mapping.closed and xmit.mapping is None
+    assert data == xmitgen.get_data(archives['fb'].members, 'MEM01')
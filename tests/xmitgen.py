@@ -0,0 +1,235 @@
+'''Builds small xmit files of an IEBCOPY unload for the tests
+
+A member is given as tuple (name, blocks, userdata, alias_of):
+ - blocks: list of the DASD blocks of its data (bytes), [] for an
+   empty member, None for an alias
+ - userdata: the user data of its directory entry, e.g. ispf_stats()
+ - alias_of: name of the member of an alias, else None
+
+Example:
+    members = [('HELLO', text_blocks(['HELLO WORLD']), ispf_stats(1), None)]
+    with open('hello.xmi', 'wb') as xmit_file:
+        xmit_file.write(build_xmit(members))
+'''
+import random
+import struct
+
+TRKCYL = 15
+RECFM_CODES = {'FB': b'\x90\x00', 'VB': b'\x50\x00', 'U': b'\xc0\x00'}
+# count, flags, MBBCCHHR and data length of a block in a data record
+BLOCK_HEADER = struct.Struct('>BBHHHBBH')
+EOF_RECORD = b'\x00' * 12
+
+def ebcdic(text):
+    'text encoded in cp037'
+    return text.encode('cp037')
+
+def text_unit(key, *datas):
+    '''text unit of a control record: key (hex), count, length and data
+    '''
+    return bytes.fromhex(key) + struct.pack('>H', len(datas)) + b''.join(
+        struct.pack('>H', len(data)) + data for data in datas)
+
+def segments(record, is_controlrecord):
+    '''record split into segments of at most 255 bytes with header
+    '''
+    out = []
+    for pos in range(0, max(len(record), 1), 253):
+        chunk = record[pos: pos + 253]
+        flags = (0x80 if pos == 0 else 0) | \
+                (0x40 if pos + 253 >= len(record) else 0) | \
+                (0x20 if is_controlrecord else 0)
+        out.append(bytes((len(chunk) + 2, flags)) + chunk)
+    return b''.join(out)
+
+def ispf_stats(lines, userid='USERX', day=291, hhmm=b'\x10\x20'):
+    '''30 bytes of ISPF statistics: version 01.02, created on day 100
+    and changed on day of 2020 at hhmm (packed)
+    '''
+    created = bytes.fromhex('0120%03dF' % 100)
+    changed = bytes.fromhex('0120%03dF' % day)
+    return struct.pack('>3Bx4s4s2s2h2x8s2x', 1, 2, 0, created, changed, hhmm,
+                       lines, lines, ebcdic(userid.ljust(8)))
+
+def lmod_attributes(alias_of=None):
+    '''user data of a load module, of an alias with the name of its member
+    '''
+    udata = struct.pack('>8xBB3s2x3sBBB', 0x80, 0, b'\x00\x10\x00',
+                        b'\x00\x00\x00', 0, 0, 0)
+    if alias_of:
+        udata += b'\x00\x00\x00' + ebcdic(alias_of.ljust(8))
+    if len(udata) % 2:
+        udata += b'\x00'
+    return udata
+
+def text_lines(count, lrecl=80, seed=0):
+    '''count lines of text of length lrecl
+    '''
+    rnd = random.Random(seed)
+    return [('LINE %05d ' % i + 'ABC' * rnd.randint(0, 20))
+            .ljust(lrecl)[:lrecl] for i in range(count)]
+
+def text_blocks(lines, blksize=800):
+    '''FB blocks of lines in cp037
+    '''
+    data = b''.join(ebcdic(line) for line in lines)
+    return [data[i: i + blksize] for i in range(0, len(data), blksize)]
+
+def vb_records(count, seed=0):
+    '''count records of text of different lengths
+    '''
+    rnd = random.Random(seed)
+    return ['REC %d ' % i + 'X' * rnd.randint(0, 60) for i in range(count)]
+
+def vb_blocks(records, blksize=300):
+    '''VB blocks of records in cp037 with block and record descriptor words
+    '''
+    blocks = []
+    current = []
+    for record in records:
+        record = struct.pack('>HH', len(record) + 4, 0) + ebcdic(record)
+        if sum(map(len, current)) + len(record) + 4 > blksize:
+            blocks.append(current)
+            current = []
+        current.append(record)
+    blocks.append(current)
+    return [struct.pack('>HH', sum(map(len, block)) + 4, 0) + b''.join(block)
+            for block in blocks]
+
+def _directory_records(entries):
+    '''the directory blocks of entries (name, (tt, r), userdata, alias)
+    as one unload record
+    '''
+    def entry_bytes(name, ttr, udata, alias):
+        count = len(udata) // 2 | (0x80 if alias else 0)
+        return ebcdic(name.ljust(8)) + \
+            struct.pack('>HBB', ttr[0], ttr[1], count) + udata
+    blocks = []
+    current = []
+    for entry in sorted(entries, key=lambda entry: ebcdic(entry[0].ljust(8))):
+        the_bytes = entry_bytes(*entry)
+        if sum(map(len, current)) + len(the_bytes) > 200:
+            blocks.append(current)
+            current = []
+        current.append(the_bytes)
+    current.append(b'\xff' * 8 + b'\x00' * 4)   # last entry
+    blocks.append(current)
+    record = b''
+    for i, block in enumerate(blocks):
+        data = b''.join(block)
+        key = b'\xff' * 8 if i == len(blocks) - 1 else block[-1][:8]
+        area = (struct.pack('>H', len(data) + 22) + data).ljust(256, b'\x00')
+        record += b'\x00' * 8 + struct.pack('>hh', 8, 256) + key + area
+    return record
+
+def build_xmit(members, recfm='FB', lrecl=80, blksize=800,
+               dsn=('HLQ', 'TEST', 'PDS'), blocks_per_record=3):
+    '''bytes of a xmit file with the pds of members
+    '''
+    entries = []
+    datarecords = []
+    member_ttr = {}
+    track = 1
+    for (name, blocks, udata, alias_of) in members:
+        if alias_of:
+            continue
+        ttr = (track, 1)
+        entries.append((name, ttr, udata, False))
+        if not blocks:
+            track += 1
+            continue
+        member_ttr[name] = ttr
+        (current, recnum) = ([], 1)
+        for block in blocks:
+            (cyl, head) = divmod(track, TRKCYL)
+            current.append(BLOCK_HEADER.pack(
+                0, 0, 0, cyl, head, recnum, 0, len(block)) + block)
+            recnum += 1
+            if recnum > 10:
+                (recnum, track) = (1, track + 1)
+            if len(current) == blocks_per_record:
+                datarecords.append(b''.join(current))
+                current = []
+        (cyl, head) = divmod(track, TRKCYL)
+        current.append(BLOCK_HEADER.pack(0, 0, 0, cyl, head, recnum, 0, 0))
+        datarecords.append(b''.join(current))
+        track += 1
+    entries.extend(
+        (name, member_ttr[alias_of], udata, True)
+        for (name, _, udata, alias_of) in members if alias_of)
+
+    recfm_code = RECFM_CODES[recfm]
+    cr1 = (b'\x00' + bytes.fromhex('CA6D0F') + struct.pack(
+        '>hhhB3xH10xh', 0x0200, blksize, lrecl, recfm_code[0], blksize,
+        TRKCYL)).ljust(64, b'\x00')
+    cr2 = (b'\x01' + b'\x00' * 15 + struct.pack(
+        '>4x6H', 0, 0, 0, 4000, 14, 60000)).ljust(276, b'\x00')
+    unload = [cr1, cr2, _directory_records(entries), EOF_RECORD] + \
+        datarecords + [EOF_RECORD]
+    inmr01 = ebcdic('INMR01') + text_unit('1011', ebcdic('NODEA')) + \
+        text_unit('1012', ebcdic('USERA')) + \
+        text_unit('1001', ebcdic('NODEB')) + \
+        text_unit('1002', ebcdic('USERB')) + \
+        text_unit('1024', ebcdic('20201018123456')) + \
+        text_unit('102F', b'\x00\x00\x00\x01')
+    inmr02 = ebcdic('INMR02') + b'\x00\x00\x00\x01' + \
+        text_unit('1028', ebcdic('IEBCOPY')) + \
+        text_unit('0002', *[ebcdic(qualifier) for qualifier in dsn]) + \
+        text_unit('003C', b'\x02\x00') + text_unit('0049', recfm_code) + \
+        text_unit('0042', struct.pack('>H', lrecl)) + \
+        text_unit('0030', struct.pack('>H', blksize))
+    inmr02_copy = ebcdic('INMR02') + b'\x00\x00\x00\x01' + \
+        text_unit('1028', ebcdic('INMCOPY')) + \
+        text_unit('003C', b'\x40\x00') + text_unit('0049', b'\x00\x01')
+    inmr03 = ebcdic('INMR03') + text_unit('0042', b'\x00\x50')
+    return b''.join(
+        [segments(record, True)
+         for record in (inmr01, inmr02, inmr02_copy, inmr03)] +
+        [segments(record, False) for record in unload] +
+        [segments(ebcdic('INMR06'), True)])
+
+def fb_members(count=12):
+    '''text members, an empty and a binary member and an alias
+    '''
+    members = [
+        ('MEM%02d' % i, text_blocks(text_lines(5 + i * 7, seed=i)),
+         ispf_stats(5 + i * 7, day=100 + i), None)
+        for i in range(count)]
+    members.append(('EMPTY', [], ispf_stats(0), None))
+    members.append(('BINARY', [bytes(range(256)) * 3], b'', None))
+    members.append(('ALIAS1', None, ispf_stats(1), 'MEM01'))
+    return members
+
+def vb_members(count=5):
+    '''text members of records of different lengths
+    '''
+    return [
+        ('VB%02d' % i, vb_blocks(vb_records(10 + 20 * i, seed=i)),
+         ispf_stats(10 + 20 * i), None)
+        for i in range(count)]
+
+def u_members(count=4):
+    '''load modules and an alias
+    '''
+    members = [
+        ('PGM%d' % i, [bytes((0x20 + i, )) * 400, b'\x01' * 300],
+         lmod_attributes(), None)
+        for i in range(count)]
+    members.append(('PGMALI', None, lmod_attributes('PGM1'), 'PGM1'))
+    return members
+
+# the archives of the tests: members and DCB
+ARCHIVES = {
+    'fb': (fb_members, dict(recfm='FB', lrecl=80, blksize=800)),
+    'vb': (vb_members, dict(recfm='VB', lrecl=255, blksize=300)),
+    'u': (u_members, dict(recfm='U', lrecl=0, blksize=6144)),
+}
+
+def get_data(members, name):
+    '''the data of member name (or its alias) as joined blocks
+    '''
+    by_name = {member[0]: member for member in members}
+    (_, blocks, _, alias_of) = by_name[name]
+    if alias_of:
+        blocks = by_name[alias_of][1]
+    return b''.join(blocks)
@@ -1,5 +1,5 @@
 '''This package only imports the main class Xmitfile
 '''
-from .xmit.file import Xmitfile
+from .xmit.file import Xmitfile, probe
 from .ttkgui.guiapp import Ttkgui
 from .utils.errors import NodataError
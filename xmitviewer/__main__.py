@@ -1,10 +1,14 @@
 ''' is run with python -m xmitviewer
 '''
+import os
+import re
 import sys
 from pathlib import Path
 
 import xmitviewer
 from xmitviewer.utils import errors
+from xmitviewer.xmit.stream import Xmitstream
+from xmitviewer.iebcopy.iebcopyds import export_member
 
 def export_all(pds):
     ''' Export all members
@@ -13,7 +17,43 @@ def export_all(pds):
     prompt = f'Export all {count} members to current directory {Path.cwd()}/ ? '
     yesno = input(prompt)
     if yesno in "yY":
-        pds.export_all()
+        workers = os.cpu_count() or 1
+        results = pds.export_all(workers=workers, processes=workers > 1)
+        failed = [result for result in results if result.error]
+        for result in failed:
+            print(f'{result.name}: {result.error}')
+        print(f'{len(results) - len(failed)} members exported, '
+              f'{len(failed)} not exported')
+
+def export_to_file(pds, path):
+    ''' Export all members into a tar, zip or NDJSON file
+    '''
+    from xmitviewer.iebcopy.export import open_sink, export_to_sink
+    try:
+        sink = open_sink(path)
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+    with sink:
+        results = list(export_to_sink(pds, sink))
+    failed = [result for result in results if result.error]
+    for result in failed:
+        print(f'{result.name}: {result.error}')
+    print(f'{len(results) - len(failed)} members exported to {path}, '
+          f'{len(failed)} not exported')
+
+def export_stream(stream):
+    ''' Export all members while reading the xmit file from stream
+    '''
+    count = 0
+    try:
+        for (member, memberdata) in Xmitstream(stream).iter_members():
+            export_member(member, memberdata)
+            count += 1
+    except errors.XmitfileError as e:
+        print(e)
+        sys.exit(1)
+    print(f'{count} members exported to {Path.cwd()}/')
 
 def open_pds(path):
     ' open path and return pds, sys.exit(1) on failure'
@@ -25,12 +65,215 @@ def open_pds(path):
     print(pds)
     return pds
 
+def list_members(pds, by_size):
+    ''' ls -l like listing of the members with the sizes of their data
+    from the block headers, with by_size largest first
+    '''
+    from xmitviewer.iebcopy.directory import LAST_NAME
+    members = [mbr for mbr in pds.members if mbr.name != LAST_NAME]
+    if by_size:
+        members.sort(key=lambda mbr: mbr.sizes.size if mbr.sizes else 0,
+                     reverse=True)
+    print(f'{"Member":8s}  {"TTR":6s} {"Bytes":>10s} {"Blocks":>5s} '
+          f'{"Records":>8s} Statistics')
+    for mbr in members:
+        print(mbr)
+    total = sum(mbr.sizes.size for mbr in members
+                if mbr.sizes and not mbr.alias)
+    print(f'{len(members)} members, {total} bytes')
+
+def show_info(paths):
+    ''' One line per xmit file from its control records
+    '''
+    for path in paths:
+        try:
+            header = xmitviewer.probe(path)
+        except (OSError, errors.XmitfileError) as e:
+            print(f'{path}: {e}')
+            continue
+        for dsn in header.datasets[:1]:
+            dcb = ','.join(f'{k}={v}' for k, v in dsn.dcb.items())
+            print(f'{path}: {header.get_inmr01()} '
+                  f'{dsn.dsn} {dsn.utiln} {dcb.upper()}')
+
+def build_catalog(db_path, roots):
+    ''' Add xmit files in roots to catalog db_path
+    '''
+    from xmitviewer.library.catalog import Catalog
+    catalog = Catalog(db_path)
+    def progress(path, error):
+        print(f'{path}: {error}' if error else path)
+    count = catalog.update(roots, progress=progress)
+    print(f'{count} files scanned, {catalog}')
+    catalog.close()
+
+def query_catalog(db_path, terms):
+    ''' Query catalog db_path with terms key=value:
+    member, user, after, before, dsn, type
+    '''
+    from xmitviewer.library.catalog import Catalog
+    keywords = {
+        'member': 'member',
+        'user': 'userid',
+        'after': 'changed_after',
+        'before': 'changed_before',
+        'dsn': 'dsn',
+        'type': 'datatype'}
+    criteria = {}
+    for term in terms:
+        (key, _, value) = term.partition('=')
+        if key not in keywords or not value:
+            print(f'invalid query term {term!r}')
+            print(HELP)
+            sys.exit(1)
+        criteria[keywords[key]] = value
+    catalog = Catalog(db_path)
+    for hit in catalog.query(**criteria):
+        stats = f'{hit.changed} {hit.changed_time} {hit.userid}'\
+            if hit.changed else hit.attributes or ''
+        print(f'{hit.path} {hit.dsn}({hit.name}) {stats} {hit.datatype}')
+    catalog.close()
+
+def grep_files(args):
+    ''' Search members of xmit files for a pattern:
+    [-F] <pattern> <file or directory> ...
+    '''
+    from xmitviewer.library.search import Searcher, search_files
+    literal = args[0] == '-F'
+    if literal:
+        args = args[1:]
+    if len(args) < 2:
+        print(HELP)
+        sys.exit(1)
+    try:
+        searcher = Searcher(args[0], literal=literal)
+    except re.error as e:
+        print(f'invalid pattern {args[0]!r}: {e}')
+        sys.exit(1)
+    count = 0
+    for result in search_files(searcher, args[1:]):
+        if result.error:
+            print(f'{result.path}: {result.error}', file=sys.stderr)
+        for match in result.matches:
+            count += 1
+            print_match(match)
+    if not count:
+        sys.exit(1)
+
+def print_match(match):
+    ' one line per match of --grep and --search '
+    if match.line is None:
+        print(f'{match.path}({match.member}):@{match.column}: '
+              f'{match.text!r}')
+    else:
+        print(f'{match.path}({match.member}):{match.line}:'
+              f'{match.column}: {match.text.rstrip()}')
+
+def build_textindex(db_path, roots):
+    ''' Add text members of xmit files in roots to text index db_path
+    '''
+    from xmitviewer.library.textindex import Textindex
+    index = Textindex(db_path)
+    def progress(path, error):
+        print(f'{path}: {error}' if error else path)
+    count = index.update(roots, progress=progress)
+    print(f'{count} files indexed, {index}')
+    index.close()
+
+def search_textindex(db_path, args):
+    ''' Search the members in text index db_path for a pattern:
+    [-F] <pattern> [<text in each match>]
+    '''
+    from xmitviewer.library.search import Searcher
+    from xmitviewer.library.textindex import Textindex
+    literal = args[0] == '-F'
+    if literal:
+        args = args[1:]
+    if len(args) not in (1, 2):
+        print(HELP)
+        sys.exit(1)
+    try:
+        searcher = Searcher(args[0], literal=literal)
+    except re.error as e:
+        print(f'invalid pattern {args[0]!r}: {e}')
+        sys.exit(1)
+    def stale(path, reason):
+        print(f'{path}: {reason}, skipped, run --textindex again',
+              file=sys.stderr)
+    index = Textindex(db_path)
+    count = 0
+    for match in index.search(
+            searcher, args[1] if args[1:] else None, stale=stale):
+        count += 1
+        print_match(match)
+    index.close()
+    if not count:
+        sys.exit(1)
+
+def diff_files(old_path, new_path, with_lines):
+    ''' Differences of the members of two xmit files of a pds
+    '''
+    from xmitviewer.iebcopy.pdsdiff import diff_pds
+    (old_pds, new_pds) = (open_pds(old_path), open_pds(new_path))
+    differences = diff_pds(old_pds, new_pds, with_lines=with_lines)
+    for difference in differences:
+        if difference.kind == 'renamed':
+            print(f'renamed {difference.name} -> {difference.new_name}')
+        elif difference.kind == 'stats':
+            print(f'stats   {difference.name} '
+                  f'{show_direntry(difference.old.direntry)} -> '
+                  f'{show_direntry(difference.new.direntry)}')
+        else:
+            print(f'{difference.kind:7s} {difference.name}')
+        if difference.lines:
+            print(''.join(difference.lines), end='')
+    print(f'{len(differences)} differences')
+
+def show_direntry(direntry):
+    ' ISPF statistics or load module attributes of --diff '
+    if isinstance(direntry, tuple):
+        return (f'{direntry.vermod} {direntry.last} {direntry.last_time} '
+                f'{direntry.lines} {direntry.userid.strip()}')
+    return direntry
+
 def main():
     ' - '
+    try:
+        run_command()
+    except BrokenPipeError:
+        # the reader of the output exited, e.g. head: stop quietly,
+        # also for the flush of stdout at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+def run_command():
+    ' runs the command given by sys.argv '
     if len(sys.argv) == 1:    # no args
         xmitviewer.Ttkgui().mainloop()
+    elif sys.argv[1] in ['-x', '--export'] and sys.argv[2:] == ['-']:
+        export_stream(sys.stdin.buffer)
     elif sys.argv[1] in ['-x', '--export'] and len(sys.argv) == 3:
         export_all(open_pds(sys.argv[2]))
+    elif sys.argv[1] in ['-x', '--export'] and len(sys.argv) == 4:
+        export_to_file(open_pds(sys.argv[2]), sys.argv[3])
+    elif sys.argv[1] in ['-l', '--list'] and len(sys.argv) in (3, 4)\
+            and sys.argv[3:] in ([], ['-S']):
+        list_members(open_pds(sys.argv[2]), sys.argv[3:] == ['-S'])
+    elif sys.argv[1] in ['-i', '--info'] and len(sys.argv) >= 3:
+        show_info(sys.argv[2:])
+    elif sys.argv[1] in ['-c', '--catalog'] and len(sys.argv) >= 4:
+        build_catalog(sys.argv[2], sys.argv[3:])
+    elif sys.argv[1] in ['-q', '--query'] and len(sys.argv) >= 3:
+        query_catalog(sys.argv[2], sys.argv[3:])
+    elif sys.argv[1] in ['-g', '--grep'] and len(sys.argv) >= 4:
+        grep_files(sys.argv[2:])
+    elif sys.argv[1] in ['-d', '--diff'] and len(sys.argv) in (4, 5)\
+            and sys.argv[4:] in ([], ['-l']):
+        diff_files(sys.argv[2], sys.argv[3], sys.argv[4:] == ['-l'])
+    elif sys.argv[1] in ['-t', '--textindex'] and len(sys.argv) >= 4:
+        build_textindex(sys.argv[2], sys.argv[3:])
+    elif sys.argv[1] in ['-s', '--search'] and len(sys.argv) >= 4:
+        search_textindex(sys.argv[2], sys.argv[3:])
     else:
         print(HELP)
         sys.exit(1)
@@ -41,7 +284,57 @@ Usage:
         starts GUI
 
     % python -m xmitviewer --export <path to xmitfile>
-       exports all members to current directory
+       exports all members to current directory with one process
+       per cpu, lists the members not exported
+
+    % python -m xmitviewer --export <path to xmitfile> <export file>
+       exports all members into a single file, its type is taken
+       from the suffix: .tar, .tar.gz, .tgz, .zip, .ndjson or .jsonl
+       Entries get the time of last change from the ISPF statistics.
+
+    % cat <xmitfile> | python -m xmitviewer --export -
+       exports all members to current directory, while reading
+       the xmit file from stdin
+
+    % python -m xmitviewer --list <path to xmitfile> [-S]
+       lists the members with bytes, blocks and records of their
+       data, taken from the block headers, with -S largest first
+
+    % python -m xmitviewer --info <path to xmitfile> ...
+       shows origin and data set of each xmit file,
+       reads only the control records in front of the data
+
+    % python -m xmitviewer --catalog <db> <file or directory> ...
+       adds the members of the xmit files to SQLite catalog db,
+       unchanged files are skipped
+
+    % python -m xmitviewer --query <db> [member=IEF*] [user=IBMUSER]
+                                        [after=2019-12-31] [before=...]
+                                        [dsn=SYS1.*] [type=ebcdic]
+       lists the cataloged members matching all terms
+
+    % python -m xmitviewer --grep [-F] <pattern> <file or directory> ...
+       searches the members of the xmit files for the regular
+       expression, or with -F for the literal text, e.g. '(?i)iefbr14'
+       ignores case. Prints file(member):line:column: line of each
+       match in text members and file(member):@offset: bytes in other
+       members. The files are searched with one process per cpu,
+       files which can't be searched are listed on stderr.
+
+    % python -m xmitviewer --diff <old xmitfile> <new xmitfile> [-l]
+       lists the members added, removed, renamed, changed or with
+       changed ISPF statistics or load module attributes, comparing
+       the hashes of the member data. With -l the changed text
+       members are shown as unified diff.
+
+    % python -m xmitviewer --textindex <db> <file or directory> ...
+       adds the text members of the xmit files to the trigram index
+       in SQLite database db, unchanged files are skipped
+
+    % python -m xmitviewer --search <db> [-F] <pattern> [<text>]
+       like --grep in the text members of the index, but reads only
+       the members containing the literal pattern or the text, which
+       must be part of each match of a regular expression
 '''
 
 main()
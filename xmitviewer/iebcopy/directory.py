@@ -28,6 +28,7 @@ import xmitviewer.iebcopy.lmoddata as lmoddata
 import xmitviewer.utils.dumper as dumper
 
 TTRC = '>HBB'
+LAST_NAME = 'FF' * 8    # name of last entry in directory, x'FF..FF'
 Ttrc = collections.namedtuple(
     'Ttrc',
     'tt r c')
@@ -36,34 +37,59 @@ class Member: # pylint: disable=too-many-instance-attributes
         - Member Name
         - Addr (TT R)
         - Length of Userdata: Last 5 bits in C field in Half Words!
-        - Userdata
+        - Userdata, decoded on first access
         - Length of Entry
+        - aliases: the alias entries of a member, filled by Iebcopyds
+        - sizes: bytes, blocks and logical records of the member data,
+            Sizes from the block headers, filled by Iebcopyds,
+            None without data
+
+        mbbcchhr: the member address, if already converted
+            from TTR, e.g. by a Directorytable
     '''
-    def __init__(self, the_bytes, cr2):
+    def __init__(self, the_bytes, cr2, mbbcchhr=None):
         self.ttrc = Ttrc(*struct.unpack(TTRC, the_bytes[8:12]))
-        self.name = dumper.check_cp037(the_bytes[:8])
-        self.name_display = dumper.to_point(the_bytes[:8])
-        self.name_is_hidden = len(self.name) > 8
         userlen = 2 * (self.ttrc.c&0b11111)
         self.entrylen = 12 + userlen
+        self.entry = bytes(the_bytes[:self.entrylen])
+        self.name = dumper.check_cp037(self.entry[:8])
         self.alias = self.ttrc.c >> 7 == 1
-        get_userdata = userdata.extract_stats if userlen in (30, 40)\
-                else lmoddata.extract_lmod if userlen > 0\
-                else lambda x, **kw: None
-        self.userdata = get_userdata(
-            the_bytes[12: self.entrylen],
-            is_alias=self.alias
-        )
-        self.mbbcchhr = cr2.convert_ttr(
+        self.aliases = []
+        self.sizes = None
+        self._userdata = None
+        self.mbbcchhr = mbbcchhr or cr2.convert_ttr(
             self.ttrc.tt,
             self.ttrc.r)
+    @property
+    def name_display(self):
+        'name with nonprintable characters masked'
+        return dumper.to_point(self.entry[:8])
+    @property
+    def name_is_hidden(self):
+        'name contains no valid MVS characters, name is hex'
+        return len(self.name) > 8
+    @property
+    def userdata(self):
+        '''ISPF statistics, load module attributes or None,
+        decoded on first access
+        '''
+        if self._userdata is None and self.entrylen > 12:
+            userlen = self.entrylen - 12
+            get_userdata = userdata.extract_stats if userlen in (30, 40)\
+                    else lmoddata.extract_lmod
+            self._userdata = get_userdata(
+                self.entry[12: self.entrylen],
+                is_alias=self.alias
+            )
+        return self._userdata
     def __repr__(self):
         name_hex = ' (x\'{:s}\')'.format(self.name) if self.name_is_hidden\
             else ''
-        return "%08s: %04X%02X %s %s" % (
+        return "%08s: %04X%02X %s %s %s" % (
             self.name_display,
             self.ttrc.tt,
             self.ttrc.r,
+            format_sizes(self.sizes),
             str(self.userdata),
             name_hex
         )
@@ -73,6 +99,15 @@ class Member: # pylint: disable=too-many-instance-attributes
         '''
         return pds.get_memberdata(self.name)
 
+def format_sizes(sizes):
+    '''ls -l like columns of Sizes: bytes, blocks and records
+    '''
+    if sizes is None:
+        return '%10s %5s %8s' % ('-', '-', '-')
+    return '%10d %5d %8s' % (
+        sizes.size, sizes.blocks,
+        '-' if sizes.records is None else sizes.records)
+
 class Directoryblock:
     '''Describes one Directory Block
         gets built from a loop over a directory block record
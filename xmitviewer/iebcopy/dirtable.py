@@ -0,0 +1,193 @@
+'''Directory of a pds as table of columns, the Member objects of its
+entries are built on first access only.
+
+Opening a pds with many thousand members (e.g. load libraries) then
+does not decode names and user data of all entries.
+'''
+import collections.abc
+import struct
+import threading
+from array import array
+
+import xmitviewer.utils.dumper as dumper
+from xmitviewer.iebcopy.directory import Member
+
+# key length and data length of a directory block, its key and byte count
+DIRBLOCK_HEADER = struct.Struct('>8xhh8sH')
+DIRBLOCK_LEN = 276
+TTRC = struct.Struct('>HBB')
+LAST_KEY = b'\xff' * 8
+
+class Directorytable(object):
+    '''The directory entries of a pds in columns:
+        - .names: the names, 8 bytes per entry
+        - .ttrcs: TTRC of the entries as TT << 16 | R << 8 | C
+        - .aliases: 1 for alias entries, else 0
+        - .entries, .offsets: the directory entries (name, ttrc and
+            user data) concatenated and the offset of each entry
+        - .addrs: the member addresses MBBCCHHR, 8 bytes per entry
+
+        Usage:
+            table = Directorytable(cr2)
+            table.add_record(the_bytes)    # for each directory record
+            mbr = table.get_member(i)
+    '''
+    def __init__(self, cr2):
+        self.cr2 = cr2
+        self.names = bytearray()
+        self.ttrcs = array('L')
+        self.aliases = array('B')
+        self.entries = bytearray()
+        self.offsets = array('L')
+        self.addrs = bytearray()
+        self._tracks = {}   # TT: MBBCCHH of the track
+    def __repr__(self):
+        return 'Directorytable of %d entries' % len(self)
+    def __len__(self):
+        return len(self.ttrcs)
+
+    def add_record(self, the_bytes):
+        '''adds the entries of the directory blocks in the directory
+        record the_bytes, see recs.get_dir_members()
+        '''
+        # Hinten wird der Block aufgefüllt, so iterate in chunks of 276
+        for start in range(0, len(the_bytes), DIRBLOCK_LEN):
+            (keylen, datalen, key, blocklen) = DIRBLOCK_HEADER.unpack_from(
+                the_bytes, start)
+            if keylen != 8 or datalen != 256:
+                raise TypeError
+            pos = start + 0x16
+            while pos < start + blocklen:
+                (tt, r, c) = TTRC.unpack_from(the_bytes, pos + 8)
+                entrylen = 12 + 2 * (c & 0b11111)
+                self.names += the_bytes[pos: pos + 8]
+                self.ttrcs.append(tt << 16 | r << 8 | c)
+                self.aliases.append(c >> 7)
+                self.offsets.append(len(self.entries))
+                self.entries += the_bytes[pos: pos + entrylen]
+                self.addrs += self.convert_ttr(tt, r)
+                pos += entrylen
+            if key == LAST_KEY:
+                break
+
+    def convert_ttr(self, rel_trk, recnum):
+        '''MBBCCHHR of TTR, cr2.convert_ttr() once per track
+        '''
+        track = self._tracks.get(rel_trk)
+        if track is None:
+            track = self.cr2.convert_ttr(rel_trk, 0)[:7]
+            self._tracks[rel_trk] = track
+        return track + bytes((recnum, ))
+
+    def get_name(self, i):
+        'raw name of entry i, 8 bytes'
+        return bytes(self.names[8 * i: 8 * i + 8])
+    def get_addr(self, i):
+        'member address MBBCCHHR of entry i'
+        return bytes(self.addrs[8 * i: 8 * i + 8])
+    def get_member(self, i):
+        '''new Member of entry i
+        '''
+        offset = self.offsets[i]
+        end = self.offsets[i + 1] if i + 1 < len(self) else len(self.entries)
+        return Member(bytes(self.entries[offset: end]), self.cr2,
+                      mbbcchhr=self.get_addr(i))
+    def is_last(self, i):
+        'entry i is the last entry of the directory, x\'FF..FF\''
+        return self.names[8 * i: 8 * i + 8] == LAST_KEY
+
+class Memberlist(object):
+    '''Sequence of the Member objects of a Directorytable,
+        each built on first access and then kept.
+        init_member: optional callable, gets each new Member,
+        e.g. to fill its aliases. Safe to use from several threads.
+    '''
+    def __init__(self, table, init_member=None):
+        self.table = table
+        self.init_member = init_member
+        self._members = [None] * len(table)
+        self._lock = threading.RLock()
+    def __repr__(self):
+        return 'Memberlist of %d members, %d built' % (
+            len(self), len(self._members) - self._members.count(None))
+    def __len__(self):
+        return len(self._members)
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        mbr = self._members[i]
+        if mbr is None:
+            if i < 0:
+                i += len(self)
+            # e.g. get_datatypes() in a thread of the GUI: build each
+            # Member once and publish it only when init_member is done
+            with self._lock:
+                mbr = self._members[i]
+                if mbr is None:
+                    mbr = self.table.get_member(i)
+                    if self.init_member:
+                        self.init_member(i, mbr)
+                    self._members[i] = mbr
+        return mbr
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+class Memberlookup(collections.abc.Mapping):
+    '''Read only mapping from a key of the directory entries to their
+        Member in members, e.g. name or address. index: dictionary
+        key: number of the entry, convert: converts a key before lookup,
+        reverse: converts the keys of index back for keys(), items()
+        and iteration. keys(), items() and values() are in the order
+        of the directory.
+    '''
+    def __init__(self, members, index, convert=None, reverse=None):
+        self.members = members
+        self.index = index
+        self.convert = convert
+        self.reverse = reverse
+    def __repr__(self):
+        return 'Memberlookup of %d keys' % len(self)
+    def __len__(self):
+        return len(self.index)
+    def __iter__(self):
+        if self.reverse is None:
+            return iter(self.index)
+        return map(self.reverse, self.index)
+    def __contains__(self, key):
+        return self._find(key) is not None
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i is None:
+            raise KeyError(key)
+        return self.members[i]
+    def get(self, key, default=None):
+        'the Member of key, default if not found'
+        i = self._find(key)
+        return default if i is None else self.members[i]
+    def _find(self, key):
+        if self.convert:
+            key = self.convert(key)
+            if key is None:
+                return None
+        return self.index.get(key)
+
+def name_to_bytes(name):
+    '''raw name of a member name as given by Member.name: the cp037
+    name filled up to 8 characters or the hex string of the bytes,
+    see bytes_to_name()
+    '''
+    if len(name) == 16:
+        try:
+            return bytes.fromhex(name)
+        except ValueError:
+            return None
+    try:
+        return name.ljust(8).encode('cp037')
+    except UnicodeError:
+        return None
+
+def bytes_to_name(the_bytes):
+    '''member name of a raw name like Member.name
+    '''
+    return dumper.check_cp037(bytes(the_bytes))
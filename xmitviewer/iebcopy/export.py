@@ -0,0 +1,274 @@
+'''Export of the members of a pds
+ - into a directory with a pool of workers: export_members()
+ - into a single tar, zip or NDJSON file: export_to_sink()
+
+Example:
+    for result in export_members(pds, outdir='out', workers=8):
+        if result.error:
+            print(result.name, result.error)
+    with open_sink('out.tar.gz') as sink:
+        results = list(export_to_sink(pds, sink))
+'''
+import base64
+import collections
+import concurrent.futures
+import datetime
+import io
+import json
+import os
+import tarfile
+import time
+import zipfile
+
+import xmitviewer.utils.errors as errors
+import xmitviewer.iebcopy.userdata as userdata
+from xmitviewer.iebcopy.directory import LAST_NAME
+from xmitviewer.iebcopy.iebcopyds import export_member
+
+# outcome of the export of one member, error is None on success
+Exportresult = collections.namedtuple('Exportresult', 'name path error')
+
+def export_members(pds, members=None, outdir='.', workers=None,
+                   max_inflight=None, datatypes=None, processes=False):
+    '''Generator of Exportresult for each member in members (default: all
+    members of pds) in their order, while the members get extracted,
+    decoded and written by a pool of workers.
+    workers: count of workers, default os.cpu_count()
+    max_inflight: count of members extracted but not yet reported,
+        limits the memory used, default 4 * workers
+    datatypes: export only members of these data types, e.g. ('ebcdic', )
+    processes: False - worker threads extract, decode and write the
+        members. True - the members get extracted here and passed to
+        worker processes for decoding and writing, which is faster
+        for large libraries of text members.
+    '''
+    if members is None:
+        members = [mbr for mbr in pds.members if mbr.name != LAST_NAME]
+    workers = workers or os.cpu_count() or 1
+    max_inflight = max_inflight or 4 * workers
+    pool = concurrent.futures.ProcessPoolExecutor if processes\
+        else concurrent.futures.ThreadPoolExecutor
+    with pool(workers) as executor:
+        inflight = collections.deque()
+        for member in members:
+            if len(inflight) >= max_inflight:
+                yield inflight.popleft().result()
+            if processes:
+                future = submit_memberdata(
+                    executor, pds, member, outdir, datatypes)
+            else:
+                future = executor.submit(
+                    export_one, pds, member, outdir, datatypes)
+            inflight.append(future)
+        while inflight:
+            yield inflight.popleft().result()
+
+def submit_memberdata(executor, pds, member, outdir, datatypes):
+    '''Extracts the member and submits writing it to executor,
+    returns the future of its Exportresult.
+    '''
+    memberdata = get_memberdata(pds, member, datatypes)
+    if isinstance(memberdata, Exportresult):
+        future = concurrent.futures.Future()
+        future.set_result(memberdata)
+        return future
+    return executor.submit(write_member, member, memberdata, outdir)
+
+def export_one(pds, member, outdir='.', datatypes=None):
+    '''Export of a single member, returns Exportresult.
+    Runs in a worker thread: the member cache of pds is not used.
+    '''
+    memberdata = get_memberdata(pds, member, datatypes)
+    if isinstance(memberdata, Exportresult):
+        return memberdata
+    return write_member(member, memberdata, outdir)
+
+def get_memberdata(pds, member, datatypes=None):
+    '''Memberdata of member, or Exportresult with the reason,
+    why it is not exported.
+    '''
+    try:
+        memberdata = pds.build_memberdata(member)
+    except errors.NodataError:
+        return Exportresult(member.name.strip(), None, 'empty member')
+    if datatypes and memberdata.datatype not in datatypes:
+        return Exportresult(
+            member.name.strip(), None,
+            'not exported: data type ' + memberdata.datatype)
+    return memberdata
+
+def write_member(member, memberdata, outdir):
+    '''Writes memberdata with export_member(), returns Exportresult
+    '''
+    name = member.name.strip()
+    try:
+        path = export_member(member, memberdata, outdir)
+    except (OSError, ValueError) as err:   # UnicodeError is a ValueError
+        return Exportresult(name, None, '{}: {}'.format(
+            type(err).__name__, err))
+    return Exportresult(name, path, None)
+
+def export_to_sink(pds, sink, datatypes=None):
+    '''Generator of Exportresult for each member with data, while the
+    members are read in physical order and added to sink, e.g. Tarsink.
+    The aliases of a member are added with the member.
+    datatypes: export only members of these data types, e.g. ('ebcdic', )
+    '''
+    for (member, memberdata) in pds.iter_members():
+        name = member.name.strip()
+        if datatypes and memberdata.datatype not in datatypes:
+            yield Exportresult(
+                name, None, 'not exported: data type ' + memberdata.datatype)
+            continue
+        try:
+            entry = sink.add(member, memberdata)
+        except ValueError as err:   # UnicodeError is a ValueError
+            yield Exportresult(name, None, '{}: {}'.format(
+                type(err).__name__, err))
+            continue
+        yield Exportresult(name, entry, None)
+
+def open_sink(path):
+    '''Sink for the file in path, the type is taken from its suffix:
+    .tar, .tar.gz or .tgz, .zip, .ndjson or .jsonl
+    '''
+    lower = str(path).lower()
+    if lower.endswith(('.tar.gz', '.tgz')):
+        return Tarsink(path, compress=True)
+    if lower.endswith('.tar'):
+        return Tarsink(path)
+    if lower.endswith('.zip'):
+        return Zipsink(path)
+    if lower.endswith(('.ndjson', '.jsonl')):
+        return Ndjsonsink(path)
+    raise ValueError('Unknown export file type: {}'.format(path))
+
+def get_export_data(memberdata):
+    '''(extension, bytes) of member data as written by export_member():
+    EBCDIC text converted to utf-8 lines, other data as binary records.
+    '''
+    if memberdata.datatype == 'ebcdic':
+        return ('txt', memberdata.get_text(
+            codepage=memberdata.codepage or 'cp273',
+            linesep='\n').encode('utf-8'))
+    if memberdata.dcb['recfm'] == 'VB':
+        return (memberdata.datatype,
+                b''.join(memberdata.get_as_records(codepage=None)))
+    return (memberdata.datatype, memberdata.the_bytes)
+
+def get_mtime(member):
+    '''Time of last change from the ISPF statistics of member
+    as seconds since the epoch, None without statistics.
+    '''
+    if not isinstance(member.userdata, userdata.UserdataStats):
+        return None
+    # packed date at offset 8, hhmm at offset 12 and ss at offset 3
+    stats = member.entry[12: member.entrylen]
+    try:
+        the_time = userdata.packed_to_time(stats[12:14] + stats[3:4])
+    except ValueError:
+        the_time = datetime.time()  # midnight of the day of the change
+    return datetime.datetime.combine(
+        userdata.julian_to_date(stats[8:12]), the_time).timestamp()
+
+class Tarsink(object):
+    '''Writes the members as entries of a tar file,
+    aliases as hard links to their member.
+    '''
+    def __init__(self, path, compress=False):
+        self.path = path
+        self.archive = tarfile.open(path, 'w:gz' if compress else 'w')
+        self.default_mtime = time.time()
+    def __repr__(self):
+        return 'Tarsink {}'.format(self.path)
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
+    def close(self):
+        'completes the tar file'
+        self.archive.close()
+    def add(self, member, memberdata):
+        '''adds member and its aliases, returns name of the entry
+        '''
+        (ext, data) = get_export_data(memberdata)
+        mtime = get_mtime(member) or self.default_mtime
+        entry = '{}.{}'.format(member.name.strip(), ext)
+        info = tarfile.TarInfo(entry)
+        (info.size, info.mtime, info.mode) = (len(data), mtime, 0o644)
+        self.archive.addfile(info, io.BytesIO(data))
+        for alias in member.aliases:
+            link = tarfile.TarInfo('{}.{}'.format(alias.name.strip(), ext))
+            (link.type, link.linkname) = (tarfile.LNKTYPE, entry)
+            (link.mtime, link.mode) = (mtime, 0o644)
+            self.archive.addfile(link)
+        return entry
+
+class Zipsink(object):
+    '''Writes the members as deflated entries of a zip file,
+    aliases as copies of their member.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+        self.default_mtime = time.time()
+    def __repr__(self):
+        return 'Zipsink {}'.format(self.path)
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
+    def close(self):
+        'completes the zip file'
+        self.archive.close()
+    def add(self, member, memberdata):
+        '''adds member and its aliases, returns name of the entry
+        '''
+        (ext, data) = get_export_data(memberdata)
+        mtime = get_mtime(member) or self.default_mtime
+        # zip can't store dates before 1980
+        date_time = max(time.localtime(mtime)[:6], (1980, 1, 1, 0, 0, 0))
+        for mbr in [member] + member.aliases:
+            info = zipfile.ZipInfo(
+                '{}.{}'.format(mbr.name.strip(), ext), date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            self.archive.writestr(info, data)
+        return '{}.{}'.format(member.name.strip(), ext)
+
+class Ndjsonsink(object):
+    '''Writes one line of json per member with its name, aliases,
+    data type, size, time of last change and the data:
+    EBCDIC text converted in 'text', other data base64 encoded in 'data'.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.ndjson = open(path, 'w', encoding='utf-8')
+    def __repr__(self):
+        return 'Ndjsonsink {}'.format(self.path)
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
+    def close(self):
+        'closes the file'
+        self.ndjson.close()
+    def add(self, member, memberdata):
+        '''adds member with its aliases, returns the member name
+        '''
+        (_, data) = get_export_data(memberdata)
+        mtime = get_mtime(member)
+        line = {
+            'name': member.name.strip(),
+            'aliases': [alias.name.strip() for alias in member.aliases],
+            'datatype': memberdata.datatype,
+            'size': memberdata.size,
+            'changed': None if mtime is None else
+                       datetime.datetime.fromtimestamp(mtime).isoformat(),
+        }
+        if memberdata.datatype == 'ebcdic':
+            line['text'] = data.decode('utf-8')
+        else:
+            line['data'] = base64.b64encode(data).decode('ascii')
+        self.ndjson.write(json.dumps(line) + '\n')
+        return line['name']
@@ -0,0 +1,138 @@
+'''Extent table of the members in an iebcopy unload data set.
+
+For every member address with data it holds the range of member data
+records and the list of the DASD blocks in these records, so the data
+of any member is found by a lookup instead of a search through the
+unload records.
+'''
+from array import array
+from collections import namedtuple
+
+# sizes of a member's data from the block headers, records None for RECFM U
+Sizes = namedtuple('Sizes', 'size blocks records')
+
+class Extenttable(object):
+    '''Extents of the members, built once per pds:
+        - .addrs: lookup from member address MBBCCHHR to extent number
+        - .starts, .stops: range of member data records (start, stop)
+        - .first_blocks, .stop_blocks: range of the extent's blocks
+        - .block_rows, .block_offsets, .block_lengths: columns of the
+            blocks: record number in datarecords, offset and length
+            of the block data in the record
+        - .record_counts: count of logical records of each extent
+
+        Usage:
+            (start, stop) = extents.get(addr, (-1, -1))
+            for (row, offset, length) in extents.get_blocks(addr): ...
+    '''
+    def __init__(self):
+        self.addrs = {}
+        self.starts = array('L')
+        self.stops = array('L')
+        self.first_blocks = array('L')
+        self.stop_blocks = array('L')
+        self.block_rows = array('L')
+        self.block_offsets = array('L')
+        self.block_lengths = array('L')
+        self.record_counts = array('L')
+    def __repr__(self):
+        return 'Extenttable of %d extents, %d blocks' % (
+            len(self), len(self.block_rows))
+    def __len__(self):
+        return len(self.starts)
+    def __contains__(self, addr):
+        return addr in self.addrs
+
+    def add_extent(self, addr, start):
+        '''starts the extent of member address addr at record start,
+        its blocks follow by add_block(), end_extent() completes it
+        '''
+        self.addrs[addr] = len(self.starts)
+        self.starts.append(start)
+        self.stops.append(start)
+        self.first_blocks.append(len(self.block_rows))
+        self.stop_blocks.append(len(self.block_rows))
+        self.record_counts.append(0)
+    def add_block(self, row, offset, length):
+        '''adds a block of record row to the last extent
+        '''
+        self.block_rows.append(row)
+        self.block_offsets.append(offset)
+        self.block_lengths.append(length)
+    def add_records(self, count):
+        '''adds count logical records to the last extent
+        '''
+        self.record_counts[-1] += count
+    def end_extent(self, stop):
+        '''the last extent ends before record stop
+        '''
+        self.stops[-1] = stop
+        self.stop_blocks[-1] = len(self.block_rows)
+
+    def get(self, addr, default=None):
+        '''range of member data records (start, stop) of addr
+        '''
+        i = self.addrs.get(addr)
+        if i is None:
+            return default
+        return (self.starts[i], self.stops[i])
+    def get_blocks(self, addr):
+        '''list of (row, offset, length) of the blocks of addr,
+        empty if there is no data
+        '''
+        i = self.addrs.get(addr)
+        if i is None:
+            return []
+        return list(zip(
+            self.block_rows[self.first_blocks[i]: self.stop_blocks[i]],
+            self.block_offsets[self.first_blocks[i]: self.stop_blocks[i]],
+            self.block_lengths[self.first_blocks[i]: self.stop_blocks[i]]))
+    def get_size(self, addr):
+        '''count of data bytes of addr
+        '''
+        i = self.addrs.get(addr)
+        if i is None:
+            return 0
+        return sum(
+            self.block_lengths[self.first_blocks[i]: self.stop_blocks[i]])
+
+    def get_sizes(self, addr, with_records=True):
+        '''Sizes of the data of addr: bytes, blocks and logical records
+        (None without with_records), None if there is no data
+        '''
+        i = self.addrs.get(addr)
+        if i is None:
+            return None
+        return Sizes(
+            sum(self.block_lengths[self.first_blocks[i]: self.stop_blocks[i]]),
+            self.stop_blocks[i] - self.first_blocks[i],
+            self.record_counts[i] if with_records else None)
+
+    def get_index(self):
+        '''the columns as dictionary, e.g. for an Indexcache
+        '''
+        return {
+            'addrs': b''.join(self.addrs.keys()),
+            'starts': self.starts,
+            'stops': self.stops,
+            'first_blocks': self.first_blocks,
+            'stop_blocks': self.stop_blocks,
+            'block_rows': self.block_rows,
+            'block_offsets': self.block_offsets,
+            'block_lengths': self.block_lengths,
+            'record_counts': self.record_counts,
+        }
+    def load_index(self, index):
+        '''restores the columns from get_index()
+        '''
+        addrs = index['addrs']
+        self.addrs = {
+            addrs[i: i+8]: n for n, i in enumerate(range(0, len(addrs), 8))}
+        self.starts = index['starts']
+        self.stops = index['stops']
+        self.first_blocks = index['first_blocks']
+        self.stop_blocks = index['stop_blocks']
+        self.block_rows = index['block_rows']
+        self.block_offsets = index['block_offsets']
+        self.block_lengths = index['block_lengths']
+        self.record_counts = index['record_counts']
@@ -1,48 +1,197 @@
 '''Module assembles the parts of a pds from the unload dataset
 as attributes of the Iebcopyds class
 '''
+import itertools
+import sys
+from array import array
+
+import xmitviewer.utils.datatype as datatype
 import xmitviewer.utils.errors as errors
-import xmitviewer.utils.address as address
-from xmitviewer.iebcopy.memberdata import Memberdata
-from xmitviewer.iebcopy.recs import gen_unload_recs as unl
-import xmitviewer.utils.errors as errors
+import xmitviewer.iebcopy.recs as recs
+import xmitviewer.iebcopy.recscntl as cntl
+import xmitviewer.iebcopy.userdata as userdata
+from xmitviewer.iebcopy.extenttable import Extenttable
+from xmitviewer.iebcopy.membercache import Membercache, DEFAULT_MAX_BYTES
+from xmitviewer.iebcopy.directory import LAST_NAME
+from xmitviewer.iebcopy.dirtable import (
+    Directorytable, Memberlist, Memberlookup, name_to_bytes, bytes_to_name)
+from xmitviewer.iebcopy.memberdata import (
+    Memberdata, BLOCKLEN, get_sample, count_vb_records)
 
 class Iebcopyds(object):
     '''Class built from Xmit-IEBCOPY Dataset
 
         - .dsn : the dataset seen from xmit file
         - .datarecords: the records which constitute the pds unload dataset
-        - .members: the members extracted from directory block records
-        - .addr_to_data, .addr_to_mbr and .mbrname_to_mbr: some lookup dicts.
+        - .rectypes: record type code of each record in datarecords
+        - .directory: Directorytable, the directory entries in columns
+        - .members: the members of the directory entries, each built
+            on first access
+        - .extents: Extenttable, lookup from member's address to its
+            range of member data records (start, stop) and its blocks.
+            The sizes of the data from the block headers are noted
+            in member.sizes.
+        - .addr_to_data, .addr_to_mbr and .mbrname_to_mbr: some lookup dicts,
+            the last two read only mappings, which build the Member
+            objects on access.
+            addr_to_mbr gives the member, not its aliases, which are
+            attached to the member in member.aliases.
+        - .member_cache: Membercache of the Memberdata objects and decoded
+            texts of the recently used members, at most cache_bytes.
 
         To access the data of some member, use get_memberdata('mbrname'),
-            which returns a Memberdata object.
+            which returns a Memberdata object, or
+            get_member_text('mbrname', codepage) for its decoded text.
+        To process all members, iter_members() reads them in physical order.
+        get_datatypes() guesses the data type of all members from the
+            first blocks of their data only.
         To extract member data to file use
             - save_member_as_binary('mbrname') or
             - save_member_as_textfile('mbrname')
+
+        index: dictionary from get_index() of an earlier instance for
+            the same data set, e.g. from an Indexcache. The records are
+            then not scanned again.
     '''
-    def __init__(self, dsn):
+    def __init__(self, dsn, index=None, cache_bytes=DEFAULT_MAX_BYTES):
 
         self.dsn = dsn
-        self.datarecords = [dbr for dbr in unl(self)]
-        self.members = []
-        cr2 = self.datarecords[1]
-        for dbr in (dbr for dbr in unl(self) if dbr.rectype == 'Dirblock'):
-            self.members.extend(dbr.get_members(cr2))
-        self.addr_to_mbr = {}
-        self.mbrname_to_mbr = {}
-        for mbr in self.members:
-            self.addr_to_mbr[mbr.mbbcchhr] = mbr
-            self.mbrname_to_mbr[mbr.name] = mbr
-        self.addr_to_data = {} # von ADDR zur ersten Position in unl()
-        for i, data in enumerate(unl(self)):
-            if data.rectype == 'Mbrdata':
-                j = self.addr_to_data.get(data.mbbcchhr, i)
-                self.addr_to_data[data.mbbcchhr] = j
+        self.member_cache = Membercache(cache_bytes)
+        records = dsn.datarecords
+        cr1 = cntl.RecCr1(records.get_bytes(0), dsn)
+        cr2 = cntl.RecCr2(records.get_bytes(1), dsn, cr1.data['TRKCYL'])
+        self.directory = Directorytable(cr2)
+        self._datatypes = None
+        if index:
+            self.rectypes = index['rectypes']
+            self.addr_to_data = dict(zip(
+                split_addresses(index['addr_to_data.addrs']),
+                index['addr_to_data.rows']))
+            for i, rectype in enumerate(self.rectypes):
+                if rectype == recs.DIRBLOCK:
+                    self.directory.add_record(records.get_bytes(i))
+        else:
+            self._scan(cr2)
+        self._build_lookups()
+        self.datarecords = recs.Unloadrecords(self, self.rectypes, cr1, cr2)
+        self.extents = Extenttable()
+        if index:
+            self.extents.load_index({
+                name[len('extents.'):]: value
+                for name, value in index.items()
+                if name.startswith('extents.')})
+        else:
+            self._build_extents()
+
+    def _scan(self, cr2):
+        '''Single pass over the unload records: classifies each record
+            by its address and collects the members of the directory
+            blocks and the first record of each member address.
+            No record objects get built.
+        '''
+        records = self.dsn.datarecords
+        self.rectypes = array('B', (recs.RECTYPE_CODES[cntl.RecCr1],
+                                    recs.RECTYPE_CODES[cntl.RecCr2]))
+        self.addr_to_data = {} # von ADDR zur ersten Position in datarecords
+        for i in range(2, len(records)):
+            data = records.get_data(i)
+            rectype = recs.rectype_code(data)
+            self.rectypes.append(rectype)
+            if rectype == recs.MBRDATA:
+                self.addr_to_data.setdefault(bytes(data[1:9]), i)
+            elif rectype == recs.DIRBLOCK:
+                self.directory.add_record(bytes(data))
+
+    def _build_lookups(self):
+        '''members and the lookups by name and address from the
+            columns of the directory, without building Member objects.
+            addr_to_mbr prefers the member to its aliases,
+            an alias without member stands for its other aliases.
+        '''
+        directory = self.directory
+        name_index = {}
+        addr_index = {}
+        for i in range(len(directory)):
+            addr = directory.get_addr(i)
+            if not directory.aliases[i] or addr not in addr_index:
+                addr_index[addr] = i
+            name_index[directory.get_name(i)] = i
+        self._alias_index = {}  # entry number of member: of its aliases
+        for i in range(len(directory)):
+            base = addr_index[directory.get_addr(i)]
+            if directory.aliases[i] and base != i:
+                self._alias_index.setdefault(base, []).append(i)
+        self.members = Memberlist(directory, self._init_member)
+        self.mbrname_to_mbr = Memberlookup(
+            self.members, name_index, name_to_bytes, bytes_to_name)
+        self.addr_to_mbr = Memberlookup(self.members, addr_index)
+
+    def _init_member(self, i, mbr):
+        '''fills aliases and sizes of the Member of directory entry i,
+            when it is built
+        '''
+        mbr.aliases = [self.members[j] for j in self._alias_index.get(i, ())]
+        mbr.sizes = self.extents.get_sizes(
+            mbr.mbbcchhr, self._counts_records())
+
+    def _counts_records(self):
+        'the extents count the logical records: VB or FB with LRECL'
+        (recfm, lrecl) = (self.dsn.dcb['recfm'], self.dsn.dcb['lrecl'])
+        return recfm == 'VB' or (recfm == 'FB' and bool(lrecl))
 
     def __repr__(self):
         return "IEBCOPY %r \n %d Member" % (self.dsn, len(self.members))
 
+    def _build_extents(self):
+        '''Fills the Extenttable: range of member data records
+            (start, stop) and their blocks for each member address
+            with data.
+            Counts the logical records from the block lengths (FB)
+            or the record descriptor words (VB).
+            The member data ends before the next record, which
+             - is not 'mbrdata' (e.g. 'eof') or
+             - has the addr of another member's first data record
+        '''
+        records = self.dsn.datarecords
+        (recfm, lrecl) = (self.dsn.dcb['recfm'], self.dsn.dcb['lrecl'])
+        starts = sorted(
+            (self.addr_to_data[addr], addr) for addr in self.addr_to_mbr
+            if addr in self.addr_to_data)
+        for (start, addr) in starts:
+            self.extents.add_extent(addr, start)
+            stop = start
+            while stop < len(self.rectypes):
+                if self.rectypes[stop] != recs.MBRDATA:
+                    break
+                data = records.get_data(stop)
+                check_addr = bytes(data[1:9])
+                if check_addr != addr and check_addr in self.addr_to_mbr:
+                    break
+                for (offset, length) in recs.block_pieces(data):
+                    self.extents.add_block(stop, offset, length)
+                    if recfm == 'VB':
+                        self.extents.add_records(count_vb_records(
+                            data[offset: offset + length]))
+                stop += 1
+            self.extents.end_extent(stop)
+            if recfm == 'FB' and lrecl:   # no LRECL: records unknown
+                self.extents.add_records(
+                    -(-self.extents.get_sizes(addr).size // lrecl))
+
+    def get_index(self):
+        '''Dictionary with the results of scanning the records,
+            an instance built with it skips the scan.
+        '''
+        index = {
+            'rectypes': self.rectypes,
+            'addr_to_data.addrs': b''.join(self.addr_to_data.keys()),
+            'addr_to_data.rows': array('L', self.addr_to_data.values()),
+        }
+        index.update(
+            ('extents.' + name, value)
+            for name, value in self.extents.get_index().items())
+        return index
+
     def save_member_as_textfile(self, mbrname, outdir='.', codepage='cp273'):
         '''Writes member data to file 'mbrname'.txt to 'outdir'
             as text file.
@@ -54,7 +203,7 @@ class Iebcopyds(object):
         textpath = outdir + '/' + mbrname.rstrip() + '.txt'
         with open(textpath, 'w') as textfile:
             textfile.writelines(self.get_memberdata(mbrname).
-                                get_as_records(codepage=codepage, linesep='\n'))
+                                iter_text(codepage=codepage, linesep='\n'))
     def save_member_as_binary(self, mbrname, outdir='.'):
         '''Writes member data to file 'mbrname'.bin' to 'outdir' as binary file.
 
@@ -63,32 +212,18 @@ class Iebcopyds(object):
         '''
         binpath = outdir + '/' + mbrname.rstrip() + '.bin'
         with open(binpath, 'wb') as binfile:
-            binfile.writelines(self.get_memberdata(mbrname).
-                               get_as_records(codepage=None, linesep=''))
+            self.get_memberdata(mbrname).write_binary(binfile)
 
-    def export_all(self):
-        '''Export all members into current directory
+    def export_all(self, outdir='.', workers=1, max_inflight=None,
+                   processes=False):
+        '''Export all members into outdir, default current directory,
+            with a pool of workers, see export.export_members().
+            Returns list of Exportresult, one per member.
         '''
-        for member in self.members:
-            try:
-                memberdata = member.get_memberdata(self)
-            except  errors.NodataError:
-                continue
-            (ext, codepage, mode, linesep) =\
-                ('txt', 'cp273', 'w', '\n')\
-                if memberdata.datatype == 'ebcdic' else\
-                (memberdata.datatype, None, 'wb', '')
-
-            save_path = "{:}.{:}".format(
-                member.name.strip(),
-                ext)
-
-            with open(save_path, mode) as save:
-               save.writelines(
-                   memberdata.get_as_records(
-                       codepage=codepage,
-                       linesep=linesep)
-               )
+        from xmitviewer.iebcopy.export import export_members
+        return list(export_members(
+            self, outdir=outdir, workers=workers, max_inflight=max_inflight,
+            processes=processes))
 
     def overview(self):
         '''returns dictionary of recordtypes
@@ -101,47 +236,207 @@ class Iebcopyds(object):
 
     def get_memberdata(self, mbrname):
         '''Collect member data from the data records and returns
-            a Memberdata object.
+            a Memberdata object, from member_cache if used recently.
 
             Uses lookup from membername to directory entry
-            and lookup from addr in directory entry to indexr
-            of first data record.
-            Now scans the data records forward until end of member data:
-             - data record not 'mbrdata' (e.g. 'eof')
-             - data record has addr equal addr of another member's
-               first data record
+            and lookup from addr in directory entry to the list
+            of its blocks in extents.
         '''
         mbrname8 = mbrname.ljust(8) # always fill up to 8 Characters
         mbr = self.mbrname_to_mbr.get(mbrname8, False)
         if not mbr:
             raise KeyError('Member ' + mbrname + ' not found')
-        addr = mbr.mbbcchhr
-        start = self.addr_to_data.get(addr, -1)
-        if start < 0: # empty member
+        memberdata = self.member_cache.get(mbrname8)
+        if memberdata is None:
+            memberdata = self.build_memberdata(mbr)
+            self.member_cache.put(mbrname8, memberdata, memberdata.size)
+        return memberdata
+
+    def iter_members(self):
+        '''Generator of (member, Memberdata) of the members with data
+            in physical order, reading the member data records once.
+            Aliases are not yielded, see member.aliases.
+        '''
+        for addr in self.extents.addrs: # ordered by first data record
+            mbr = self.addr_to_mbr[addr]
+            try:
+                yield (mbr, self.build_memberdata(mbr))
+            except errors.NodataError:
+                continue
+
+    def get_datatype(self, mbr):
+        '''Data type of the data of directory entry mbr, guessed from its
+            first records like Memberdata.datatype, but reading only the
+            first blocks. 'empty' for members without data.
+        '''
+        (the_type, sample) = self._get_sample(mbr)
+        return the_type or datatype.get_type(sample)
+
+    def _get_sample(self, mbr):
+        '''(data type, None) if the data type of mbr is known without
+            classifying its data, else (None, sample of the first records)
+        '''
+        blocks = self.iter_blocks(mbr)
+        first = next(blocks, None)
+        if first is None:
+            return ('empty', None)
+        recfm = self.dsn.dcb['recfm']
+        if recfm == 'U':
+            return ('lmod', None)
+        if recfm == 'VB' and (len(first) < 4 or
+                              BLOCKLEN.unpack_from(first)[0] != len(first)):
+            # records span the blocks, Memberdata joins them
+            return (self.build_memberdata(mbr).datatype, None)
+        return (None, get_sample(
+            itertools.chain([first], blocks), self.dsn.dcb))
+
+    def get_datatypes(self):
+        '''Dictionary member name: data type of all members and aliases
+            like get_datatype(), kept for the next call. The samples of
+            all members are classified in one batch by
+            datatype.classify_samples().
+        '''
+        if self._datatypes is None:
+            addr_to_type = {}
+            samples = {}    # member address: sample
+            for addr in self.extents.addrs:  # physical order
+                mbr = self.addr_to_mbr.get(addr)
+                if mbr is None:
+                    continue
+                (the_type, sample) = self._get_sample(mbr)
+                if the_type:
+                    addr_to_type[addr] = the_type
+                else:
+                    samples[addr] = sample
+            addr_to_type.update(zip(samples, (
+                the_type for (the_type, _) in
+                datatype.classify_samples(list(samples.values())))))
+            self._datatypes = {
+                mbr.name: addr_to_type.get(mbr.mbbcchhr, 'empty')
+                for mbr in self.members if mbr.name != LAST_NAME}
+        return self._datatypes
+
+    def get_stats(self):
+        '''ISPF statistics of all members with statistics as
+            userdata.Statscolumns, decoded from the directory at once
+            without building the Member objects. Its rows are the
+            numbers of the entries in members and directory.
+        '''
+        table = self.directory
+        ends = list(table.offsets[1:]) + [len(table.entries)]
+        return userdata.extract_stats_columns([
+            bytes(table.entries[offset + 12: end])
+            for offset, end in zip(table.offsets, ends)])
+
+    def get_member_text(self, mbrname, codepage='cp273', linesep='\n'):
+        '''The records of member converted from codepage and joined
+            by linesep, kept in member_cache.
+        '''
+        key = (mbrname.ljust(8), codepage, linesep)
+        text = self.member_cache.get(key)
+        if text is None:
+            text = linesep.join(self.get_memberdata(mbrname).
+                                get_lines(codepage=codepage))
+            self.member_cache.put(key, text, sys.getsizeof(text))
+        return text
+
+    def build_memberdata(self, mbr):
+        '''Memberdata of directory entry mbr built from its blocks
+            in extents, without member_cache.
+            Raises NodataError for empty members.
+        '''
+        blocks = list(self.iter_blocks(mbr))
+        if not blocks: # empty member
             raise errors.NodataError
-        stop = start
-        while True:
-            stop = stop + 1
-            rec = self.datarecords[stop]
-            if rec.rectype != 'Mbrdata':
-                break
-            check_member = self.addr_to_mbr.get(rec.mbbcchhr, False)
-            if check_member and check_member.name != mbrname8:
-                break
-
-#       Insbesondere Bei PDS-Lademodulbibliotheken kann ein Unloadrecord
-#       mehrere DASD-Blöcke des PDS enthalten:
-#          dr.reclen > dr.address.dd
-        memberdata = []
-        for dr in self.datarecords[start: stop]:
-            i = 0
-            while i < dr.reclen - 12:
-                addr = address.build_address(dr.the_bytes[i: i+12])
-                i = i + 12
-                memberdata.append(dr.the_bytes[i:addr.dd+i])
-                i = i + addr.dd
-        return Memberdata(
-            mbr,
-            self.dsn.dcb,
-            b''.join(memberdata)
+        return Memberdata(mbr, self.dsn.dcb, blocks=blocks)
+
+    def iter_blocks(self, mbr):
+        '''Generator of the DASD blocks of directory entry mbr as slices
+            of the record data (usually memoryviews, no copy), e.g. to
+            hash the member data without joining it.
+        '''
+        yield from self._gen_block_data(self.extents.get_blocks(mbr.mbbcchhr))
+
+    def _gen_block_data(self, blocks):
+        '''Generator of the data of blocks (row, offset, length)
+            as slices of the record data
+        '''
+        (row, data) = (None, None)
+        for (block_row, offset, length) in blocks:
+            if block_row != row:
+                row = block_row
+                data = self.dsn.datarecords.get_data(row)
+            yield data[offset: offset + length]
+
+def gen_members(dsn, unload_records):
+    '''Generator of (member, Memberdata) in a single pass over the
+        unload records (bytes) of dsn, e.g. while reading a stream.
+        The directory precedes the member data, so each member is
+        complete, when the data of the next member starts or a record
+        other than 'mbrdata' follows. Aliases follow their member and
+        are attached to it in member.aliases.
+    '''
+    def complete(names, memberdata):
+        if not any(memberdata):
+            return
+        names[0].aliases = names[1:]
+        for mbr in names:
+            yield (mbr, Memberdata(mbr, dsn.dcb, blocks=memberdata))
+
+    records = iter(unload_records)
+    cr1 = cntl.RecCr1(next(records), dsn)
+    cr2 = cntl.RecCr2(next(records), dsn, cr1.data['TRKCYL'])
+    addr_to_names = {}  # member followed by its aliases
+    (names, memberdata) = (None, [])
+    for the_bytes in records:
+        recordtype = recs.classify(the_bytes)
+        if recordtype is recs.RecDirblock:
+            for mbr in recs.RecDirblock(the_bytes, dsn).get_members(cr2):
+                same_addr = addr_to_names.setdefault(mbr.mbbcchhr, [])
+                if mbr.alias:
+                    same_addr.append(mbr)
+                else:
+                    same_addr.insert(0, mbr)
+            continue
+        if recordtype is recs.RecMbrdata:
+            next_names = addr_to_names.get(the_bytes[1:9], names)
+            if next_names is names:
+                if names:
+                    memberdata.extend(recs.split_blocks(the_bytes))
+                continue
+        else:
+            next_names = None
+        yield from complete(names, memberdata)
+        names = next_names
+        memberdata = list(recs.split_blocks(the_bytes)) if names else []
+    yield from complete(names, memberdata)
+
+def export_member(member, memberdata, outdir='.'):
+    '''Write member data to file in outdir:
+        - EBCDIC text converted from its code page to 'mbrname'.txt
+        - other data as binary file with data type as extension
+        Returns the path of the file.
+    '''
+    ext = 'txt' if memberdata.datatype == 'ebcdic' else memberdata.datatype
+
+    save_path = "{:}/{:}.{:}".format(
+        outdir,
+        member.name.strip(),
+        ext)
+
+    if memberdata.datatype == 'ebcdic':
+        with open(save_path, 'w', encoding='utf-8') as save:
+            save.writelines(
+                memberdata.iter_text(
+                    codepage=memberdata.codepage or 'cp273',
+                    linesep='\n')
             )
+    else:
+        with open(save_path, 'wb') as save:
+            memberdata.write_binary(save)
+    return save_path
+
+def split_addresses(the_bytes):
+    '''Splits concatenated 8 byte addresses MBBCCHHR into a list
+    '''
+    return [the_bytes[i: i+8] for i in range(0, len(the_bytes), 8)]
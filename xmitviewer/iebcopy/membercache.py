@@ -0,0 +1,62 @@
+'''LRU cache of member data with a byte budget, used by Iebcopyds
+for the Memberdata objects and their decoded text.
+'''
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+class Membercache(object):
+    '''Keeps values with their size in bytes. If the sum of the sizes
+        exceeds max_bytes, the least recently used values are dropped.
+        Values larger than max_bytes are not kept at all,
+        max_bytes=0 disables the cache.
+
+        - .nbytes: sum of sizes of the cached values
+        - .hits, .misses: counters of get()
+    '''
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key: (value, size)
+    def __repr__(self):
+        return 'Membercache of %d entries, %d of %d bytes, %d hits, %d misses'\
+            % (len(self), self.nbytes, self.max_bytes, self.hits, self.misses)
+    def __len__(self):
+        return len(self._entries)
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        '''the value of key, default if not cached
+        '''
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+    def put(self, key, value, size):
+        '''keep value of size bytes under key
+        '''
+        self.discard(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            (_, (_, dropped)) = self._entries.popitem(last=False)
+            self.nbytes -= dropped
+    def discard(self, key):
+        '''drop key from the cache, if present
+        '''
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[1]
+    def clear(self):
+        '''drop all values, the counters are kept
+        '''
+        self._entries.clear()
+        self.nbytes = 0
@@ -1,40 +1,97 @@
 '''Module for Memberdata: Code to extract member's data records
 '''
+import itertools
 import struct
+from array import array
 
 import xmitviewer.utils.datatype as datatype
 import xmitviewer.utils.errors as errors
 
+# block descriptor word of VB blocks: length of block
+BLOCKLEN = struct.Struct('>H')
+# count of records to guess the data type from
+SAMPLE_RECORDS = 5
+
 class Memberdata(object):
     '''Describes the data of an member.
 
         - .member : corresponding directory entry object.
+        - .blocks: the DASD blocks of the member data, usually
+            memoryviews of the records in the xmit file (no copy)
         - .the_bytes: the bytes of member data: The concatenation of
-            of blocks according to RECFM of PDS.
+            of blocks according to RECFM of PDS, joined on first access.
+        - .size: count of bytes of member data
         - .dcb : needed for unblocking of the bytes in get_as_records()
         - .datatype: short string guessing the the file type, e.g.
             ascii, ebcdic, zip, pdf, xmit
+        - .codepage: the EBCDIC code page guessed for text members,
+            e.g. cp273 or cp037, else None
+        - get_record(i), get_records(start, stop): random access to
+            the records by number, e.g. for paging, see count_records()
+
+        Either the_bytes or the list of blocks must be given.
     '''
-    def __init__(self, member, dcb, the_bytes):
-        if not the_bytes:
+    def __init__(self, member, dcb, the_bytes=None, blocks=None):
+        if blocks is None:
+            blocks = [the_bytes] if the_bytes else []
+        self.size = sum(len(block) for block in blocks)
+        if not self.size:
             # Aus ISPF-Edit können leere Member entstehen!
             raise errors.NodataError
         self.member = member
-        self.the_bytes = the_bytes
+        self.blocks = blocks
+        self._the_bytes = the_bytes
+        self._record_index = None
 
         self.dcb = dcb
+        self.codepage = None
         if dcb['recfm'] == 'U':
             self.datatype = 'lmod'
         else:
-            first_bytes = b''.join(
-                [r for i, r in enumerate(self.get_as_records(codepage=None))
-                    if i < 5])
-            self.datatype = datatype.get_type(first_bytes)
+            (self.datatype, self.codepage) = datatype.classify(
+                get_sample(self._get_buffers(), dcb))
 
     def __repr__(self):
         return "%r %r %i Bytes" % (self.member.name,
                                    self.datatype,
-                                   len(self.the_bytes))
+                                   self.size)
+    def __getstate__(self):
+        '''for pickle, e.g. to pass it to another process:
+        memoryviews can't be pickled, so keep the joined bytes only.
+        '''
+        state = self.__dict__.copy()
+        state['_the_bytes'] = self.the_bytes
+        state['blocks'] = [self.the_bytes]
+        return state
+    @property
+    def the_bytes(self):
+        '''the member data as bytes, joined from the blocks once
+        '''
+        if self._the_bytes is None:
+            self._the_bytes = b''.join(self.blocks)
+        return self._the_bytes
+
+    def _get_buffers(self):
+        '''the buffers to unblock: the blocks, if each of them holds
+            complete records, else the joined bytes.
+        '''
+        if self._the_bytes is not None:
+            return [self._the_bytes]
+        if len(self.blocks) == 1:
+            return self.blocks
+        recfm = get_blocking(self.dcb)
+        if recfm == 'FB':
+            lrecl = self.dcb['lrecl']
+            complete = all(len(block) % lrecl == 0 for block in self.blocks)
+        elif recfm == 'VB':
+            complete = all(
+                len(block) >= 4 and
+                BLOCKLEN.unpack_from(block)[0] == len(block)
+                for block in self.blocks)
+        else:
+            complete = False
+        return self.blocks if complete else [self.the_bytes]
+
     def get_as_records(self, codepage='cp273', linesep=''):
         ''' Unblocks member data into records separated by linesep
             if cp is none, no code page conversion occurs.
@@ -46,35 +103,230 @@ class Memberdata(object):
                     i, r in enumerate(m.get_as_records(linesep='\\n'))))
 
         '''
-        recfm = self.dcb['recfm']
+        recfm = get_blocking(self.dcb)
         if recfm == 'FB':
             lrecl = self.dcb['lrecl']
-            for i in range(0, len(self.the_bytes), lrecl):
-                if codepage is None:
-                    yield self.the_bytes[i: i + lrecl]
-                else:
-                    yield self.the_bytes[i: i + lrecl].\
-                        decode(codepage) + linesep
-        elif recfm == 'VB':
-        #   2H Blocklänge
-        #   n * Logical Record:
-        #       2H Satzlänge incl Daten
-        #       xx Daten
-            j = 0
-            while True: # iterate over the blocks
-                (lblock, _) = struct.unpack('>2H', self.the_bytes[j:j+4])
-                i = j + 4
-                j = j + lblock # j points to begin of next block
-                while i < j: # iterate over the logical records in block
-                    (lrecl, _) = struct.unpack('>2H', self.the_bytes[i:i+4])
+            for buffer in self._get_buffers():
+                for i in range(0, len(buffer), lrecl):
                     if codepage is None:
-                        yield self.the_bytes[i + 4: i + lrecl]
+                        yield bytes(buffer[i: i + lrecl])
                     else:
-                        yield self.the_bytes[i + 4: i + lrecl].\
-                            decode(codepage) + linesep
-                    i = i + lrecl
-                if j > len(self.the_bytes) - 4:
-                    break
+                        yield str(buffer[i: i + lrecl], codepage) + linesep
+        elif recfm == 'VB':
+            for buffer in self._get_buffers():
+                yield from gen_vb_records(buffer, codepage, linesep)
 
         else:   # recfm=U
             yield self.the_bytes
+
+    def get_lines(self, codepage='cp273', strip=False):
+        '''List of the records converted from codepage,
+            with strip without trailing blanks.
+            FB data is decoded a block at a time, see iter_text().
+        '''
+        lines = []
+        for buffer in self._get_buffers():
+            lines.extend(self._decode_lines(buffer, codepage, strip))
+        return lines
+
+    def get_text(self, codepage='cp273', linesep='\n', strip=False):
+        '''The records converted from codepage as one string,
+            each followed by linesep. Same as
+            ''.join(get_as_records(codepage, linesep)) without strip.
+        '''
+        return ''.join(self.iter_text(codepage, linesep, strip))
+
+    def iter_text(self, codepage='cp273', linesep='\n', strip=False):
+        '''Generator of the text converted from codepage in chunks of
+            complete records, each record followed by linesep,
+            e.g. for writelines().
+            FB data is decoded as a whole block and then split by LRECL,
+            instead of decoding record by record.
+        '''
+        for buffer in self._get_buffers():
+            lines = self._decode_lines(buffer, codepage, strip)
+            if lines:
+                yield linesep.join(lines) + linesep
+
+    def _decode_lines(self, buffer, codepage, strip):
+        '''the records in buffer converted from codepage as list
+        '''
+        recfm = get_blocking(self.dcb)
+        if recfm == 'FB':
+            lrecl = self.dcb['lrecl']
+            text = str(buffer, codepage)
+            if len(text) == len(buffer):    # single byte code page
+                lines = [text[i: i + lrecl]
+                         for i in range(0, len(text), lrecl)]
+            else:
+                lines = [str(buffer[i: i + lrecl], codepage)
+                         for i in range(0, len(buffer), lrecl)]
+        elif recfm == 'VB':
+            lines = list(gen_vb_records(buffer, codepage, ''))
+        else:   # recfm=U
+            lines = [str(buffer, codepage)]
+        if strip:
+            lines = [line.rstrip(' ') for line in lines]
+        return lines
+
+    def _get_record_index(self):
+        '''(offsets, lengths) of the records in the_bytes, without the
+            record descriptor words of VB. Built on first use by walking
+            the descriptor words once, FB records are computed from LRECL.
+        '''
+        if self._record_index is None:
+            recfm = get_blocking(self.dcb)
+            if recfm == 'VB':
+                offsets = array('L')
+                lengths = array('H')
+                for (offset, length) in gen_vb_offsets(self.the_bytes):
+                    offsets.append(offset)
+                    lengths.append(length)
+            elif recfm == 'FB':
+                lrecl = self.dcb['lrecl']
+                offsets = array('L', range(0, self.size, lrecl))
+                lengths = array('H', [lrecl] * len(offsets))
+                if offsets:
+                    lengths[-1] = self.size - offsets[-1]
+            else:   # recfm=U
+                offsets = array('L', [0])
+                lengths = array('L', [self.size])
+            self._record_index = (offsets, lengths)
+        return self._record_index
+
+    def count_records(self):
+        '''count of records, builds the record index on first use
+        '''
+        return len(self._get_record_index()[0])
+
+    def get_record(self, i, codepage='cp273'):
+        ''' Record number i (from 0, negative from the end) without
+            decoding the records before it, see get_as_records().
+            Raises IndexError, if there is no record i.
+        '''
+        (offsets, lengths) = self._get_record_index()
+        offset = offsets[i]
+        record = self.the_bytes[offset: offset + lengths[i]]
+        return record if codepage is None else str(record, codepage)
+
+    def get_records(self, start=0, stop=None, codepage='cp273'):
+        ''' List of the records start up to stop, limited like a slice.
+
+            Usage example, the third page of 50 lines:
+
+                lines = m.get_records(100, 150)
+        '''
+        (offsets, lengths) = self._get_record_index()
+        the_bytes = self.the_bytes
+        records = [
+            the_bytes[offset: offset + length] for (offset, length) in
+            zip(offsets[start: stop], lengths[start: stop])]
+        if codepage is None:
+            return records
+        return [str(record, codepage) for record in records]
+
+    def write_binary(self, binfile):
+        '''Writes the records concatenated as bytes to binfile.
+            With RECFM FB and U these are the blocks, which are written
+            without joining them first.
+        '''
+        if self.dcb['recfm'] == 'VB':
+            binfile.writelines(self.get_as_records(codepage=None))
+        else:
+            binfile.writelines(self.blocks)
+
+def get_blocking(dcb):
+    '''RECFM of dcb as used to unblock the data: 'FB', 'VB' or 'U'.
+        FB without LRECL and other record formats are read as one
+        record like U.
+    '''
+    recfm = dcb['recfm']
+    if recfm == 'VB' or (recfm == 'FB' and dcb['lrecl']):
+        return recfm
+    return 'U'
+
+def get_sample(buffers, dcb, count=SAMPLE_RECORDS):
+    '''The first count records in buffers (FB or VB, e.g. the blocks of
+        a member) concatenated without descriptor words, as used to guess
+        the data type. Reads only as many buffers as needed.
+        All bytes, if the records are unknown (see get_blocking()).
+    '''
+    recfm = get_blocking(dcb)
+    if recfm == 'VB':
+        return b''.join(itertools.islice(itertools.chain.from_iterable(
+            gen_vb_records(buffer, None, '') for buffer in buffers), count))
+    if recfm != 'FB':
+        return b''.join(buffers)
+    size = count * dcb['lrecl']
+    (parts, length) = ([], 0)
+    for buffer in buffers:
+        parts.append(buffer)
+        length += len(buffer)
+        if length >= size:
+            break
+    return b''.join(parts)[:size]
+
+def count_vb_records(block):
+    '''count of the logical records in a VB block, walking only
+        the record descriptor words
+    '''
+    if len(block) < 4:
+        return 0
+    count = 0
+    (i, j) = (4, min(BLOCKLEN.unpack_from(block)[0], len(block) - 3))
+    while i < j:
+        lrecl = BLOCKLEN.unpack_from(block, i)[0]
+        if lrecl < 4:
+            break   # damaged block
+        count += 1
+        i += lrecl
+    return count
+
+def gen_vb_offsets(buffer):
+    '''Generator of (offset, length) of the records in the VB blocks in
+        buffer, without the record descriptor words,
+        see Memberdata.get_record(). Stops at a damaged block or record
+        with a length below 4.
+    '''
+    j = 0
+    while True: # iterate over the blocks
+        lblock = BLOCKLEN.unpack_from(buffer, j)[0]
+        if lblock < 4:
+            return  # damaged block
+        i = j + 4
+        j = j + lblock # j points to begin of next block
+        while i < j: # iterate over the logical records in block
+            lrecl = BLOCKLEN.unpack_from(buffer, i)[0]
+            if lrecl < 4:
+                return  # damaged record
+            yield (i + 4, lrecl - 4)
+            i = i + lrecl
+        if j > len(buffer) - 4:
+            break
+
+def gen_vb_records(buffer, codepage, linesep):
+    '''Generator of the records in the VB blocks in buffer,
+        see Memberdata.get_as_records()
+    '''
+    #   2H Blocklänge
+    #   n * Logical Record:
+    #       2H Satzlänge incl Daten
+    #       xx Daten
+    j = 0
+    while True: # iterate over the blocks
+        (lblock, _) = struct.unpack('>2H', buffer[j:j+4])
+        if lblock < 4:
+            return  # damaged block
+        i = j + 4
+        j = j + lblock # j points to begin of next block
+        while i < j: # iterate over the logical records in block
+            (lrecl, _) = struct.unpack('>2H', buffer[i:i+4])
+            if lrecl < 4:
+                return  # damaged record
+            if codepage is None:
+                yield bytes(buffer[i + 4: i + lrecl])
+            else:
+                yield str(buffer[i + 4: i + lrecl], codepage) + linesep
+            i = i + lrecl
+        if j > len(buffer) - 4:
+            break
@@ -0,0 +1,133 @@
+'''Differences between two versions of a pds, e.g. a new xmit file
+of the same library.
+
+The data of every member is hashed in one pass over the blocks of each
+pds, without joining them. The members are compared by name, hash of
+the data and their directory entry: ISPF statistics or the attributes
+of load modules. Members removed from the old pds and added to the new
+one with the same data are reported as renamed.
+
+Example:
+    for difference in diff_pds(old_pds, new_pds, with_lines=True):
+        print(difference)
+        print(''.join(difference.lines))
+'''
+import difflib
+import hashlib
+from collections import namedtuple
+
+import xmitviewer.utils.errors as errors
+import xmitviewer.iebcopy.userdata as userdata
+import xmitviewer.iebcopy.lmoddata as lmoddata
+from xmitviewer.iebcopy.directory import LAST_NAME
+
+# what is compared of a member, digest of the data or None if empty
+Memberinfo = namedtuple('Memberinfo', 'name alias digest size direntry')
+# kind: added, removed, changed (data), renamed, stats (directory entry)
+# lines: unified diff of changed text members with with_lines=True
+Difference = namedtuple('Difference', 'kind name new_name old new lines')
+Difference.__new__.__defaults__ = (None, )
+
+def member_infos(pds, algorithm='sha1'):
+    '''Dictionary name: Memberinfo of the members of pds with the
+    digest of their data, aliases with the digest of their member.
+    VB data is hashed without the block descriptor words, so the
+    digest does not depend on the blocking.
+    '''
+    is_vb = pds.dsn.dcb['recfm'] == 'VB'
+    digests = {}    # member address: (digest, size)
+    for addr in pds.extents.addrs:  # physical order, each block once
+        digest = hashlib.new(algorithm)
+        size = 0
+        for block in pds.iter_blocks(pds.addr_to_mbr[addr]):
+            if is_vb:
+                block = block[4:]
+            digest.update(block)
+            size += len(block)
+        digests[addr] = (digest.hexdigest(), size)
+    return {
+        mbr.name.strip(): Memberinfo(
+            mbr.name.strip(), mbr.alias,
+            *digests.get(mbr.mbbcchhr, (None, 0)),
+            get_direntry(mbr))
+        for mbr in pds.members if mbr.name != LAST_NAME}
+
+def get_direntry(mbr):
+    '''what is compared of the user data in the directory entry:
+    the ISPF statistics, attributes of a load module or None
+    '''
+    if isinstance(mbr.userdata, userdata.UserdataStats):
+        return mbr.userdata.stats
+    if isinstance(mbr.userdata, lmoddata.UserdataLmod):
+        return mbr.userdata.attributes
+    return None
+
+def diff_pds(old_pds, new_pds, with_lines=False, codepage='cp273'):
+    '''List of Difference between old_pds and new_pds ordered by kind
+    and name. with_lines: unified diff of the changed text members
+    '''
+    old_infos = member_infos(old_pds)
+    new_infos = member_infos(new_pds)
+    return diff_infos(old_infos, new_infos) if not with_lines else [
+        difference._replace(lines=diff_lines(
+            old_pds, new_pds, difference.name, codepage=codepage))
+        if difference.kind == 'changed' else difference
+        for difference in diff_infos(old_infos, new_infos)]
+
+def diff_infos(old_infos, new_infos):
+    '''List of Difference between two results of member_infos()
+    '''
+    removed = sorted(set(old_infos) - set(new_infos))
+    added = sorted(set(new_infos) - set(old_infos))
+    differences = []
+    # renamed: same data of a removed and an added member
+    added_by_digest = {}
+    for name in added:
+        info = new_infos[name]
+        if info.digest is not None and not info.alias:
+            added_by_digest.setdefault(info.digest, []).append(name)
+    for name in removed[:]:
+        info = old_infos[name]
+        if info.digest is None or info.alias:
+            continue
+        candidates = added_by_digest.get(info.digest)
+        if candidates:
+            new_name = candidates.pop(0)
+            removed.remove(name)
+            added.remove(new_name)
+            differences.append(Difference(
+                'renamed', name, new_name, info, new_infos[new_name]))
+    differences.extend(
+        Difference('removed', name, None, old_infos[name], None)
+        for name in removed)
+    differences.extend(
+        Difference('added', name, name, None, new_infos[name])
+        for name in added)
+    for name in sorted(set(old_infos) & set(new_infos)):
+        (old, new) = (old_infos[name], new_infos[name])
+        if old.digest != new.digest:
+            differences.append(Difference('changed', name, name, old, new))
+        elif old.direntry != new.direntry or old.alias != new.alias:
+            differences.append(Difference('stats', name, name, old, new))
+    order = ('added', 'removed', 'renamed', 'changed', 'stats')
+    differences.sort(key=lambda d: (order.index(d.kind), d.name))
+    return differences
+
+def diff_lines(old_pds, new_pds, name, new_name=None, codepage='cp273'):
+    '''Unified diff of the lines of text member name in old_pds and
+    new_name (default name) in new_pds as list of lines with newline,
+    None if one of them is no text member or empty.
+    '''
+    new_name = new_name or name
+    try:
+        old_data = old_pds.get_memberdata(name)
+        new_data = new_pds.get_memberdata(new_name)
+    except errors.NodataError:
+        return None
+    if old_data.datatype != 'ebcdic' or new_data.datatype != 'ebcdic':
+        return None
+    return list(difflib.unified_diff(
+        [line + '\n' for line in old_data.get_lines(codepage, strip=True)],
+        [line + '\n' for line in new_data.get_lines(codepage, strip=True)],
+        '{}({})'.format(old_pds.dsn.dsn, name),
+        '{}({})'.format(new_pds.dsn.dsn, new_name)))
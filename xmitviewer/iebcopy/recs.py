@@ -7,40 +7,58 @@
 
    Function gen_unload_rec():
         generator for sequence of Unloadrecords
+   Function rectype_code():
+        record type of an unload record without building an object
+   class Unloadrecords:
+        sequence of Unloadrecords built on access from their record types
 '''
+import struct
 
 from xmitviewer.iebcopy.unloadrec import Unloadrecord
-import xmitviewer.utils.address as address
 import xmitviewer.iebcopy.directory as directory
 import xmitviewer.iebcopy.recscntl as cntl
 
+# flag and keylen k of the address fmbbcchhrkdd in front of the record
+FLAG_KEYLEN = struct.Struct('>B8xB')
+# data length dd of the address in front of a block
+BLOCKLEN = struct.Struct('>10xH')
+
 def gen_unload_recs(pds):
     '''Scans the records in iebcopy unload data set and
        returns list of record objects
     '''
     dsn = pds.dsn
     recs = dsn.datarecords
-    cr1 = cntl.RecCr1(recs[0], dsn)
+    cr1 = cntl.RecCr1(recs.get_bytes(0), dsn)
     yield cr1
-    yield cntl.RecCr2(recs[1], dsn, cr1.data['TRKCYL'])
-    for rec in recs[2:]:
-        the_bytes = rec.the_bytes
-        rec_address = address.build_address(the_bytes[:12])\
-            if len(the_bytes) >= 12 else None
-        if len(the_bytes) < 12:
-            recordtype = RecUnknown
-        elif rec_address.k == 8:   # keylen
-            recordtype = RecDirblock
-        elif len(the_bytes) == 12:
-            recordtype = RecEof
-        elif rec_address.flag == 0:
-            recordtype = RecMbrdata
-        elif rec_address.flag in (0x04, 0x08):
-            recordtype = RecAttrib
-        else:
-            recordtype = RecUnknown
-
-        yield recordtype(the_bytes, dsn)
+    yield cntl.RecCr2(recs.get_bytes(1), dsn, cr1.data['TRKCYL'])
+    for i in range(2, len(recs)):
+        the_bytes = recs.get_bytes(i)
+        yield classify(the_bytes)(the_bytes, dsn)
+
+def classify(the_bytes):
+    '''returns the record class of an unload record
+       following the first two control records
+    '''
+    return RECTYPES[rectype_code(the_bytes)]
+
+def rectype_code(data):
+    '''returns the code (index in RECTYPES) of the record type of an
+       unload record following the first two control records.
+       data may be bytes or a memoryview, only its address is read.
+    '''
+    if len(data) < 12:
+        return UNKNOWN
+    (flag, keylen) = FLAG_KEYLEN.unpack_from(data)
+    if keylen == 8:
+        return DIRBLOCK
+    if len(data) == 12:
+        return EOF
+    if flag == 0:
+        return MBRDATA
+    if flag in (0x04, 0x08):
+        return ATTRIB
+    return UNKNOWN
 
 class RecDirblock(Unloadrecord):
     '''Record contains directory blocks of fixed length 276
@@ -59,17 +77,22 @@ class RecDirblock(Unloadrecord):
     def get_members(self, cr2):
         '''return the members in this Directory Block
         '''
-        members = []
-        #
-        # Hinten wird der Block aufgefüllt, so iterate in chunks of 276
-        # to get the directory block records
-        #
-        for i in range(0, len(self.the_bytes), 276):
-            dbr = directory.Directoryblock(self.the_bytes[i:], cr2)
-            members.extend(dbr.members)
-            if dbr.last:
-                break
-        return members
+        return get_dir_members(self.the_bytes, cr2)
+
+def get_dir_members(the_bytes, cr2):
+    '''return the members in the directory block record the_bytes
+    '''
+    members = []
+    #
+    # Hinten wird der Block aufgefüllt, so iterate in chunks of 276
+    # to get the directory block records
+    #
+    for i in range(0, len(the_bytes), 276):
+        dbr = directory.Directoryblock(the_bytes[i: i + 276], cr2)
+        members.extend(dbr.members)
+        if dbr.last:
+            break
+    return members
 
 class RecMbrdata(Unloadrecord):
     '''Record contains data of a particular member.
@@ -82,6 +105,30 @@ class RecMbrdata(Unloadrecord):
         self.the_bytes = the_bytes
         self.mbbcchhr = the_bytes[1:9]
 
+def split_blocks(the_bytes):
+    '''Generator of the data of the DASD blocks in a member data record,
+    see block_pieces().
+    '''
+    for (offset, length) in block_pieces(the_bytes):
+        yield the_bytes[offset: offset + length]
+
+def block_pieces(data):
+    '''Generator of (offset, length) of the DASD blocks in a member data
+    record (bytes or memoryview).
+    Each block is prefixed by its 12 byte address, whose dd field gives
+    the length of the block data. The record may end with an address
+    of length zero.
+    Insbesondere Bei PDS-Lademodulbibliotheken kann ein Unloadrecord
+    mehrere DASD-Blöcke des PDS enthalten.
+    '''
+    reclen = len(data)
+    i = 0
+    while i < reclen - 12:
+        (length, ) = BLOCKLEN.unpack_from(data, i)
+        i = i + 12
+        yield (i, min(length, reclen - i))
+        i = i + length
+
 class RecAttrib(Unloadrecord):
     '''The unload data set from PDSEs contains attribute records.
     These are not documented by IBM and are ignored here.
@@ -102,3 +149,49 @@ class RecUnknown(Unloadrecord):
     def __init__(self, the_bytes, dsn):
         Unloadrecord.__init__(self, the_bytes, dsn)
         self.the_bytes = the_bytes
+
+RECTYPES = (
+    cntl.RecCr1,
+    cntl.RecCr2,
+    RecDirblock,
+    RecMbrdata,
+    RecAttrib,
+    RecEof,
+    RecUnknown)
+RECTYPE_CODES = {rectype: code for code, rectype in enumerate(RECTYPES)}
+MBRDATA = RECTYPE_CODES[RecMbrdata]
+DIRBLOCK = RECTYPE_CODES[RecDirblock]
+ATTRIB = RECTYPE_CODES[RecAttrib]
+EOF = RECTYPE_CODES[RecEof]
+UNKNOWN = RECTYPE_CODES[RecUnknown]
+
+class Unloadrecords(object):
+    '''Sequence of the unload records of pds.
+    rectypes holds the code of the record type (index in RECTYPES) of
+    each data record, the record object gets built on access.
+    '''
+    def __init__(self, pds, rectypes, cr1, cr2):
+        self.dsn = pds.dsn
+        self.rectypes = rectypes
+        self.cr1 = cr1
+        self.cr2 = cr2
+    def __repr__(self):
+        return 'Unloadrecords of %r, %d records' % (self.dsn.dsn, len(self))
+    def __len__(self):
+        return len(self.rectypes)
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i == 0:
+            return self.cr1
+        if i == 1:
+            return self.cr2
+        return RECTYPES[self.rectypes[i]](
+            self.dsn.datarecords.get_bytes(i),
+            self.dsn)
+    def get_bytes(self, i):
+        '''the bytes of record i
+        '''
+        return self.dsn.datarecords.get_bytes(i)
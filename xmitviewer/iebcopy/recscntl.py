@@ -20,8 +20,7 @@ class RecCr1(Unloadrecord):
     R1DEVTYP DS    XL20          DEVICE TYPE INFORMATION
     R1TRKCYL EQU   R1DEVTYP+10,2,C'H'
     '''
-    def __init__(self, datarecord, dsn):
-        the_bytes = datarecord.the_bytes
+    def __init__(self, the_bytes, dsn):
         Unloadrecord.__init__(self, the_bytes, dsn)
         if not the_bytes[1:4] == bytearray.fromhex('CA6D0F'):
             raise TypeError
@@ -34,8 +33,7 @@ class RecCr2(Unloadrecord):
     '''CopyR2: Second Header Record with the DEB Extensions
         needed for conversion between relative TTR and MBBCCHHR
     '''
-    def __init__(self, datarecord, dsn, tracks_in_cylinder):
-        cr2 = datarecord.the_bytes
+    def __init__(self, cr2, dsn, tracks_in_cylinder):
         Unloadrecord.__init__(self, cr2, dsn)
         cnt_debx = cr2[0]
         self.trkcyl = tracks_in_cylinder
@@ -2,32 +2,68 @@
     its Userdata in Directory Entry
 '''
 import datetime
+import functools
 from collections import namedtuple
 import struct
 
 import xmitviewer.utils.dumper as dumper
 
 ISPFUSERDATA = struct.Struct('>3Bx 4s 4s 2s 2h 2x 7s')
+# whole ISPF statistics for iter_unpack(): 30 bytes standard,
+# 40 bytes extended with line counts of 4 bytes at the end
+ISPFSTATS = struct.Struct('>3Bc 4s 4s 2s 3h 8s 2x')
+ISPFSTATS_EXT = struct.Struct('>3Bc 4s 4s 2s 3h 8s 3l')
+FLAG_EXTENDED = 0x20    # extended statistics: use the 4 byte line counts
 Userdata = namedtuple(
     'Userdata',
     'ver mod flags crea last last_time lines lines_initial userid')
 Stats = namedtuple(
     'Stats',
     'vermod  crea last last_time lines lines_initial userid')
-def extract_stats(userdata, is_alias):    # pylint: disable=unused-argument
+# statistics of many members as columns, see extract_stats_columns()
+Statscolumns = namedtuple(
+    'Statscolumns',
+    'rows vermod created changed lines lines_initial lines_modified userid')
+
+@functools.lru_cache(maxsize=None)
+def julian_to_date(julian):
+    ''' 4 bytes packed P'0cyydddF' to datetime.date,
+        memoized: the members of a pds share few dates.
+        Raises ValueError for invalid dates.
+    '''
+    yyyyddd = str(julian[0] + 19) + julian.hex()[2:-1]
+    return datetime.datetime.strptime(yyyyddd, '%Y%j').date()
 
-    '''returns named tuple of ispf member statistics
+@functools.lru_cache(maxsize=None)
+def julian_to_strdate(julian):
+    ''' 4 bytes packed P'0cyydddF'
+        to ISO-dateString
     '''
-    def julian_to_strdate(julian):
-        ''' 4 bytes packed P'0cyydddF'
-            to ISO-dateString
-        '''
+    return julian_to_date(julian).strftime('%Y-%m-%d')
 
-        yyyyddd = str(julian[0] + 19) + julian.hex()[2:-1]
-        the_date = datetime.datetime.strptime(yyyyddd, '%Y%j').date()
-        return the_date.strftime('%Y-%m-%d')
+@functools.lru_cache(maxsize=None)
+def packed_to_time(hhmmss):
+    ''' 2 bytes packed hhmm or 3 bytes hhmmss to datetime.time,
+        raises ValueError for invalid times
+    '''
+    return datetime.time(*(int(hhmmss[i: i + 1].hex())
+                           for i in range(len(hhmmss))))
+
+def time_to_str(hhmm):
+    ''' 2 bytes packed hhmm to 'HH:MM',
+        the hex digits if invalid
+    '''
+    try:
+        return packed_to_time(hhmm).strftime('%H:%M')
+    except ValueError:
+        return '{}:{}'.format(hhmm[:1].hex(), hhmm[1:].hex())
 
-    if len(userdata) != 30: # std ISPF Statistics
+def extract_stats(userdata, is_alias):    # pylint: disable=unused-argument
+
+    '''returns named tuple of ispf member statistics,
+    from 30 bytes or 40 bytes of extended statistics
+    '''
+    if len(userdata) not in (30, 40): # std or extended ISPF Statistics
         return UserdataUnknown(
             userdata,
             error_text='len={:}'.format(len(userdata))
@@ -37,11 +73,54 @@ def extract_stats(userdata, is_alias):    # pylint: disable=unused-argument
     vermod = "{:02d}.{:02d}".format(udata.ver, udata.mod)
     crea = julian_to_strdate(udata.crea)
     last = julian_to_strdate(udata.last)
-    last_time = "{:02d}:{:02d}".format(udata.last_time[0], udata.last_time[1])
+    last_time = time_to_str(udata.last_time)
     userid = udata.userid.decode('cp273')
+    (lines, lines_initial) = (udata.lines, udata.lines_initial)
+    if len(userdata) == 40 and udata.flags & FLAG_EXTENDED:
+        (lines, lines_initial, _) = struct.unpack_from('>3l', userdata, 28)
     return UserdataStats(Stats(
         vermod, crea, last, last_time,
-        udata.lines, udata.lines_initial, userid))
+        lines, lines_initial, userid))
+
+def extract_stats_columns(userdatas):
+    '''Decodes the ISPF statistics of many members at once into
+    Statscolumns of typed values, e.g. for sorting and filtering:
+        - rows: position in userdatas of each decoded entry,
+            entries without 30 or 40 bytes of statistics are skipped
+        - vermod: (version, modification level)
+        - created: datetime.date, changed: datetime.datetime with
+            the time of the change to the second, None if invalid
+        - lines, lines_initial, lines_modified: int
+        - userid: str without trailing blanks
+    userdatas: sequence of the userdata of the directory entries
+    '''
+    decoded = []    # (row, values of the other columns)
+    for (layout, size) in ((ISPFSTATS, 30), (ISPFSTATS_EXT, 40)):
+        rows = [row for row, data in enumerate(userdatas)
+                if len(data) == size]
+        if not rows:
+            continue
+        joined = b''.join(userdatas[row] for row in rows)
+        for (row, fields) in zip(rows, layout.iter_unpack(joined)):
+            (ver, mod, flags, seconds, crea, last, last_time) = fields[:7]
+            lines = fields[7:10]
+            if size == 40 and flags & FLAG_EXTENDED:
+                lines = fields[11:14]
+            try:
+                created = julian_to_date(crea)
+            except ValueError:
+                created = None
+            try:
+                changed = datetime.datetime.combine(
+                    julian_to_date(last), packed_to_time(last_time + seconds))
+            except ValueError:
+                changed = None
+            decoded.append((
+                row, (ver, mod), created, changed, lines[0], lines[1],
+                lines[2], fields[10][:7].decode('cp273').rstrip()))
+    decoded.sort()
+    return Statscolumns(*(list(column) for column in zip(*decoded))) \
+        if decoded else Statscolumns([], [], [], [], [], [], [], [])
 
 class UserdataStats(object):
     '''ISPF statistics
@@ -0,0 +1,3 @@
+'''Contains the modules working on a library of many xmit files,
+	e.g. the catalog of their members.
+'''
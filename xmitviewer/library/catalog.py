@@ -0,0 +1,295 @@
+'''Catalog of the members in a library of xmit files
+
+The catalog is a SQLite database with the tables
+ - archives: one row per xmit file, with size and mtime for
+   incremental updates
+ - datasets: the data sets (INMR02) of the archives
+ - members: the directory entries of the pds with ISPF statistics
+   or load module attributes, data type and size of the data
+
+Example:
+    cat = Catalog('xmit.db')
+    cat.update(['/data/cbttape'])
+    for hit in cat.query(member='IEF*', userid='SYSPROG',
+                         changed_after='2019-12-31'):
+        print(hit)
+'''
+import os
+import sqlite3
+import concurrent.futures
+from collections import namedtuple
+from pathlib import Path
+
+from xmitviewer.xmit.file import Xmitfile
+import xmitviewer.iebcopy.userdata as userdata
+import xmitviewer.iebcopy.lmoddata as lmoddata
+from xmitviewer.iebcopy.directory import LAST_NAME
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS archives (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    origin TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS datasets (
+    archive_id INTEGER NOT NULL,
+    seq INTEGER,
+    dsn TEXT,
+    utiln TEXT,
+    recfm TEXT,
+    lrecl INTEGER,
+    dsorg TEXT,
+    blksz INTEGER
+);
+CREATE TABLE IF NOT EXISTS members (
+    archive_id INTEGER NOT NULL,
+    dsn TEXT,
+    name TEXT,
+    alias INTEGER,
+    ttr INTEGER,
+    vermod TEXT,
+    created TEXT,
+    changed TEXT,
+    changed_time TEXT,
+    lines INTEGER,
+    userid TEXT,
+    attributes TEXT,
+    datatype TEXT,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS members_name ON members(name);
+CREATE INDEX IF NOT EXISTS members_archive ON members(archive_id);
+CREATE INDEX IF NOT EXISTS datasets_archive ON datasets(archive_id);
+'''
+# PRAGMA user_version of the catalog, the archives of an older version
+# are scanned again by the next update(). 1: changed_time read as packed
+# decimal, before as binary
+VERSION = 1
+# archives stored per transaction by update()
+COMMIT_EVERY = 100
+Hit = namedtuple(
+    'Hit',
+    'path dsn name alias changed changed_time userid lines '
+    'attributes datatype size')
+
+class Catalog(object):
+    '''SQLite catalog of xmit files, see module doc.
+    '''
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(str(db_path))
+        self.connection.executescript(SCHEMA)
+        (version, ) = self.connection.execute(
+            'PRAGMA user_version').fetchone()
+        if version < VERSION:
+            self.connection.execute('UPDATE archives SET mtime_ns = NULL')
+            self.connection.execute('PRAGMA user_version = %d' % VERSION)
+            self.connection.commit()
+    def __repr__(self):
+        (count_archives, ) = self.connection.execute(
+            'SELECT count(*) FROM archives').fetchone()
+        (count_members, ) = self.connection.execute(
+            'SELECT count(*) FROM members').fetchone()
+        return 'Catalog {}: {} archives, {} members'.format(
+            self.db_path, count_archives, count_members)
+    def close(self):
+        'close the database'
+        self.connection.close()
+
+    def update(self, roots, workers=None, with_datatype=True, prune=True,
+               progress=None):
+        '''Scans the xmit files in roots (files or directory trees)
+        with a pool of worker processes and writes them to the catalog.
+        Only new files and files with changed size or mtime are scanned,
+        files which can't be read are stored with their error.
+        The catalog is committed every COMMIT_EVERY archives.
+        With prune, archives below roots which do not exist any more are
+        removed from the catalog.
+        progress: optional callable, gets path and error text (or None)
+        of each scanned file.
+        Returns count of scanned files.
+        '''
+        known = {
+            path: (size, mtime_ns) for (path, size, mtime_ns) in
+            self.connection.execute(
+                'SELECT path, size, mtime_ns FROM archives')}
+        found = set()
+        to_scan = []
+        for path in find_files(roots):
+            found.add(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # unreadable now, scan_archive() notes the error
+                to_scan.append(path)
+                continue
+            if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                to_scan.append(path)
+        if prune:
+            root_paths = [str(Path(root).resolve()) for root in roots]
+            root_prefixes = tuple(path + os.sep for path in root_paths)
+            for path in known:
+                if path in found:
+                    continue
+                if path in root_paths or path.startswith(root_prefixes):
+                    self.remove(path)
+
+        for (count, (archive, datasets, members)) in enumerate(
+                scan_archives(to_scan, workers, with_datatype), 1):
+            self.store(archive, datasets, members)
+            if progress:
+                progress(archive['path'], archive['error'])
+            if not count % COMMIT_EVERY:
+                # an interrupted update keeps the archives scanned so far
+                self.connection.commit()
+        self.connection.commit()
+        return len(to_scan)
+
+    def remove(self, path):
+        '''remove the archive in path from the catalog
+        '''
+        row = self.connection.execute(
+            'SELECT id FROM archives WHERE path = ?', (path, )).fetchone()
+        if row is None:
+            return
+        for table in ('members', 'datasets'):
+            self.connection.execute(
+                'DELETE FROM {} WHERE archive_id = ?'.format(table), row)
+        self.connection.execute('DELETE FROM archives WHERE id = ?', row)
+
+    def store(self, archive, datasets, members):
+        '''store the result of scan_archive() in the catalog,
+        replacing an older entry of the same path.
+        '''
+        self.remove(archive['path'])
+        cursor = self.connection.execute(
+            'INSERT INTO archives (path, size, mtime_ns, origin, error) '
+            'VALUES (:path, :size, :mtime_ns, :origin, :error)', archive)
+        archive_id = cursor.lastrowid
+        self.connection.executemany(
+            'INSERT INTO datasets VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            ((archive_id, ) + dataset for dataset in datasets))
+        self.connection.executemany(
+            'INSERT INTO members VALUES '
+            '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            ((archive_id, ) + member for member in members))
+
+    def query(self, member=None, userid=None, changed_after=None,
+              changed_before=None, dsn=None, datatype=None):
+        '''Returns list of Hit for the members matching all given criteria.
+        member, userid and dsn may contain wildcards * and ?,
+        dates as yyyy-mm-dd.
+        '''
+        conditions = []
+        params = []
+        for (column, value) in (('m.name', member),
+                                ('m.userid', userid),
+                                ('m.dsn', dsn)):
+            if value is not None:
+                conditions.append(column + ' GLOB ?')
+                params.append(value.upper())
+        for (condition, value) in (('m.changed > ?', changed_after),
+                                   ('m.changed < ?', changed_before),
+                                   ('m.datatype = ?', datatype)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        sql = ('SELECT a.path, m.dsn, m.name, m.alias, m.changed, '
+               'm.changed_time, m.userid, m.lines, m.attributes, '
+               'm.datatype, m.size '
+               'FROM members m JOIN archives a ON a.id = m.archive_id')
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY a.path, m.name'
+        return [Hit(*row) for row in self.connection.execute(sql, params)]
+
+def find_files(roots):
+    '''Generator of the absolute paths of all files in roots,
+    which are files or directories searched recursively.
+    '''
+    for root in roots:
+        root = Path(root).resolve()
+        if root.is_file():
+            yield str(root)
+            continue
+        for (dirpath, _, filenames) in os.walk(root):
+            for filename in sorted(filenames):
+                yield os.path.join(dirpath, filename)
+
+def scan_archives(paths, workers=None, with_datatype=True):
+    '''Generator of scan_archive() results of paths,
+    scanned in a process pool unless workers == 1.
+    '''
+    if workers == 1:
+        for path in paths:
+            yield scan_archive(path, with_datatype)
+        return
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(scan_archive, path, with_datatype)
+            for path in paths]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+def scan_archive(path, with_datatype=True):
+    '''Scans a xmit file and returns catalog data as plain tuples:
+        (archive, datasets, members)
+    Failures are noted in archive['error'].
+    '''
+    archive = {
+        'path': path,
+        'size': None,
+        'mtime_ns': None,
+        'origin': None,
+        'error': None
+    }
+    datasets = []
+    members = []
+    try:
+        stat = os.stat(path)
+        (archive['size'], archive['mtime_ns']) = (
+            stat.st_size, stat.st_mtime_ns)
+        with Xmitfile(path) as xmit:
+            archive['origin'] = xmit.get_inmr01()
+            for seq, dsn in enumerate(xmit.datasets):
+                datasets.append((
+                    seq, dsn.dsn, dsn.utiln, dsn.dcb['recfm'],
+                    dsn.dcb['lrecl'], dsn.dcb['dsorg'], dsn.dcb['blksz']))
+            if xmit.datasets and xmit.datasets[0].utiln == 'IEBCOPY':
+                pds = xmit.get_pds()
+                # classified in one batch without reading all member data
+                datatypes = pds.get_datatypes() if with_datatype else {}
+                members = [
+                    member_row(
+                        pds, mbr,
+                        (datatypes[mbr.name],
+                         mbr.sizes.size if mbr.sizes else 0)
+                        if with_datatype else (None, None))
+                    for mbr in pds.members if mbr.name != LAST_NAME]
+    except Exception as err:    # pylint: disable=broad-except
+        # corrupt archives must not stop the scan of the library
+        archive['error'] = '{}: {}'.format(type(err).__name__, err)
+    return (archive, datasets, members)
+
+def member_row(pds, mbr, type_and_size):
+    '''row of table members without archive_id,
+    type_and_size: data type and size of member data
+    '''
+    (vermod, created, changed, changed_time, lines, userid, attributes) =\
+        (None, ) * 7
+    if isinstance(mbr.userdata, userdata.UserdataStats):
+        stats = mbr.userdata.stats
+        (vermod, created, changed, changed_time, lines, userid) = (
+            stats.vermod, stats.crea, stats.last, stats.last_time,
+            stats.lines, stats.userid.strip())
+    elif isinstance(mbr.userdata, lmoddata.UserdataLmod):
+        attributes = mbr.userdata.attributes
+    (datatype, size) = type_and_size
+    return (
+        pds.dsn.dsn, mbr.name.strip(), int(mbr.alias),
+        mbr.ttrc.tt << 8 | mbr.ttrc.r,
+        vermod, created, changed, changed_time, lines, userid,
+        attributes, datatype, size)
@@ -0,0 +1,126 @@
+'''Content search (grep) in the members of xmit files
+
+Text members (data type ebcdic) are decoded from the code page and
+searched line by line, the members of other data types are searched
+as raw bytes. Many xmit files are searched by a pool of worker processes.
+
+Example:
+    searcher = Searcher('IEFBR14', literal=True)
+    for result in search_files(searcher, ['/data/cbttape']):
+        for match in result.matches:
+            print(match)
+'''
+import re
+import concurrent.futures
+from collections import namedtuple
+
+from xmitviewer.xmit.stream import iter_file_members
+from xmitviewer.library.catalog import find_files
+
+# a hit: line and column count from 1 in text members,
+# in binary members line is None and column is the offset from 0
+Match = namedtuple('Match', 'path member line column text')
+# the matches of a xmit file, error is None if it could be searched
+Searchresult = namedtuple('Searchresult', 'path matches error')
+# patterns, which can match a line alone but not within all lines:
+# string anchors \A \Z, lookarounds (?= (?! (?<= (?<!, inline flags,
+# conditionals; only (?: and (?P groups are harmless
+NO_PREFILTER = re.compile(r'\\[AZ]|\(\?(?![:P])')
+
+class Searcher(object):
+    '''Regular expression or literal (literal=True) to search for.
+        - .text_re: compiled for the decoded text members
+        - .lines_re: text_re with re.MULTILINE, to search all lines
+            of a member at once before searching line by line. Only
+            for literals and patterns without \\A, \\Z, lookarounds
+            and inline flags (see NO_PREFILTER), which could fail
+            next to the other lines, else None.
+        - .bytes_re: compiled for the raw data of other members,
+            the pattern encoded in latin-1, a literal also encoded
+            in codepage. None with binary=False or if the pattern
+            can't be encoded.
+    '''
+    def __init__(self, pattern, literal=False, ignore_case=False,
+                 codepage='cp273', binary=True):
+        self.pattern = pattern
+        self.literal = literal
+        self.codepage = codepage
+        flags = re.IGNORECASE if ignore_case else 0
+        self.text_re = re.compile(
+            re.escape(pattern) if literal else pattern, flags)
+        self.lines_re = None
+        if literal or not NO_PREFILTER.search(pattern):
+            self.lines_re = re.compile(
+                self.text_re.pattern, flags | re.MULTILINE)
+        self.bytes_re = None
+        if binary:
+            try:
+                alternatives = [pattern.encode('latin-1')]
+                if literal:
+                    alternatives = [re.escape(alternatives[0])]
+                    ebcdic = re.escape(pattern.encode(codepage))
+                    if ebcdic not in alternatives:
+                        alternatives.append(ebcdic)
+                self.bytes_re = re.compile(b'|'.join(alternatives), flags)
+            except UnicodeError:
+                pass
+    def __repr__(self):
+        return 'Searcher {!r} in {}'.format(self.pattern, self.codepage)
+
+    def search_pds(self, pds, path=None):
+        '''Generator of Match in the members of pds in physical order
+        '''
+        for (_, memberdata) in pds.iter_members():
+            yield from self.search_memberdata(memberdata, path)
+
+    def search_memberdata(self, memberdata, path=None):
+        '''Generator of Match in the data of a member
+        '''
+        name = memberdata.member.name.strip()
+        if memberdata.datatype == 'ebcdic':
+            lines = memberdata.get_lines(codepage=self.codepage)
+            # most members don't match: one search over all lines first
+            if self.lines_re and not self.lines_re.search('\n'.join(lines)):
+                return
+            for (number, line) in enumerate(lines, 1):
+                for found in self.text_re.finditer(line):
+                    yield Match(path, name, number, found.start() + 1, line)
+        elif self.bytes_re is not None:
+            for found in self.bytes_re.finditer(memberdata.the_bytes):
+                yield Match(path, name, None, found.start(), found.group())
+
+    def search_file(self, path):
+        '''Searches the pds in the xmit file path, returns Searchresult.
+        Failures are noted in its error. Containers are searched while
+        decompressing, see stream.iter_file_members().
+        '''
+        try:
+            matches = [
+                match for (_, memberdata) in iter_file_members(path)
+                for match in self.search_memberdata(memberdata, path)]
+        except Exception as err:    # pylint: disable=broad-except
+            # corrupt archives must not stop the search of the library
+            return Searchresult(
+                path, [], '{}: {}'.format(type(err).__name__, err))
+        return Searchresult(path, matches, None)
+
+def search_files(searcher, roots, workers=None):
+    '''Generator of Searchresult of the xmit files in roots (files or
+    directory trees) as soon as each one is searched,
+    in a process pool unless workers == 1 or there is only one file.
+    '''
+    paths = list(find_files(roots))
+    if workers == 1 or len(paths) <= 1:
+        for path in paths:
+            yield searcher.search_file(path)
+        return
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(searcher.search_file, path) for path in paths]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                yield future.result()
+        finally:
+            # closed early, e.g. the output ended: skip the files left
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,321 @@
+'''Persistent trigram index over the text members of xmit files
+
+The index narrows a search to the members containing all trigrams of the
+searched text, only these get read and searched exactly. It is kept in a
+SQLite database (it may be the one of the catalog) with the tables
+ - text_archives: one row per xmit file, with size and mtime for
+   incremental updates
+ - text_members: the indexed members (data type ebcdic) of the archives
+ - trigrams: per trigram and archive the numbers of its members
+   containing the trigram, as little endian integers of 4 bytes
+ - text_version: the version of these tables
+
+Adding or changing xmit files only indexes these, the rows of the other
+archives stay as they are.
+
+Example:
+    index = Textindex('xmit.db')
+    index.update(['/data/cbttape'])
+    for match in index.search(Searcher('MYCOPY', literal=True)):
+        print(match)
+'''
+import os
+import sqlite3
+import sys
+import concurrent.futures
+from array import array
+from pathlib import Path
+
+import xmitviewer.utils.errors as errors
+from xmitviewer.xmit.file import Xmitfile
+from xmitviewer.xmit.stream import iter_file_members
+from xmitviewer.library.catalog import find_files
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS text_archives (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    codepage TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS text_members (
+    archive_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    name TEXT,
+    PRIMARY KEY (archive_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS trigrams (
+    trigram TEXT NOT NULL,
+    archive_id INTEGER NOT NULL,
+    members BLOB,
+    PRIMARY KEY (trigram, archive_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS trigrams_archive ON trigrams(archive_id);
+CREATE TABLE IF NOT EXISTS text_version (
+    version INTEGER
+);
+'''
+# version of the tables, an index of an older version is emptied and
+# gets indexed again by the next update(). 1: members as little endian
+# integers of 4 bytes, before as C unsigned long of the platform
+VERSION = 1
+# typecode of the arrays of member numbers in trigrams.members: 4 bytes
+# unsigned, stored little endian, so the database can be copied between
+# platforms
+MEMBERS_TYPE = next(code for code in 'IL' if array(code).itemsize == 4)
+
+class Textindex(object):
+    '''Trigram index of the text members of xmit files, see module doc.
+    The text is indexed in upper case, so the candidates cover
+    searches with and without ignore case.
+    '''
+    def __init__(self, db_path, codepage='cp273'):
+        self.db_path = db_path
+        self.codepage = codepage
+        self.connection = sqlite3.connect(str(db_path))
+        self.connection.executescript(SCHEMA)
+        row = self.connection.execute(
+            'SELECT max(version) FROM text_version').fetchone()
+        if row[0] is None or row[0] < VERSION:
+            for table in ('trigrams', 'text_members', 'text_archives',
+                          'text_version'):
+                self.connection.execute('DELETE FROM {}'.format(table))
+            self.connection.execute(
+                'INSERT INTO text_version VALUES (?)', (VERSION, ))
+            self.connection.commit()
+    def __repr__(self):
+        (count_archives, ) = self.connection.execute(
+            'SELECT count(*) FROM text_archives').fetchone()
+        (count_members, ) = self.connection.execute(
+            'SELECT count(*) FROM text_members').fetchone()
+        return 'Textindex {}: {} archives, {} members'.format(
+            self.db_path, count_archives, count_members)
+    def close(self):
+        'close the database'
+        self.connection.close()
+
+    def update(self, roots, workers=None, prune=True, progress=None):
+        '''Indexes the xmit files in roots (files or directory trees)
+        with a pool of worker processes, see Catalog.update().
+        Only new files and files with changed size or mtime are indexed.
+        Returns count of indexed files.
+        '''
+        known = {
+            path: (size, mtime_ns) for (path, size, mtime_ns) in
+            self.connection.execute(
+                'SELECT path, size, mtime_ns FROM text_archives')}
+        found = set()
+        to_index = []
+        for path in find_files(roots):
+            found.add(path)
+            stat = os.stat(path)
+            if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                to_index.append(path)
+        if prune:
+            root_paths = [str(Path(root).resolve()) for root in roots]
+            root_prefixes = tuple(path + os.sep for path in root_paths)
+            for path in known:
+                if path in found:
+                    continue
+                if path in root_paths or path.startswith(root_prefixes):
+                    self.remove(path)
+
+        for (archive, names, postings) in index_archives(
+                to_index, self.codepage, workers):
+            self.store(archive, names, postings)
+            if progress:
+                progress(archive['path'], archive['error'])
+        self.connection.commit()
+        return len(to_index)
+
+    def remove(self, path):
+        '''remove the archive in path from the index
+        '''
+        row = self.connection.execute(
+            'SELECT id FROM text_archives WHERE path = ?', (path, )
+            ).fetchone()
+        if row is None:
+            return
+        for table in ('trigrams', 'text_members'):
+            self.connection.execute(
+                'DELETE FROM {} WHERE archive_id = ?'.format(table), row)
+        self.connection.execute('DELETE FROM text_archives WHERE id = ?', row)
+
+    def store(self, archive, names, postings):
+        '''store the result of index_archive() in the index,
+        replacing an older entry of the same path.
+        '''
+        self.remove(archive['path'])
+        cursor = self.connection.execute(
+            'INSERT INTO text_archives (path, size, mtime_ns, codepage, '
+            'error) VALUES (:path, :size, :mtime_ns, :codepage, :error)',
+            archive)
+        archive_id = cursor.lastrowid
+        self.connection.executemany(
+            'INSERT INTO text_members VALUES (?, ?, ?)',
+            ((archive_id, seq, name) for seq, name in enumerate(names)))
+        self.connection.executemany(
+            'INSERT INTO trigrams VALUES (?, ?, ?)',
+            ((trigram, archive_id, members)
+             for trigram, members in postings.items()))
+
+    def candidates(self, text=None):
+        '''Dictionary path: list of names of the members, which contain
+        all trigrams of text in upper case. Without text or with less
+        than three characters all indexed members.
+        '''
+        grams = get_trigrams(text.upper()) if text else set()
+        if not grams:
+            rows = self.connection.execute(
+                'SELECT a.path, m.name FROM text_members m '
+                'JOIN text_archives a ON a.id = m.archive_id '
+                'ORDER BY a.path, m.seq')
+            result = {}
+            for (path, name) in rows:
+                result.setdefault(path, []).append(name)
+            return result
+        by_archive = {}
+        grams = sorted(grams)
+        for start in range(0, len(grams), 500):  # limit of sql variables
+            part = grams[start: start + 500]
+            for (archive_id, members) in self.connection.execute(
+                    'SELECT archive_id, members FROM trigrams '
+                    'WHERE trigram IN ({})'.format(','.join('?' * len(part))),
+                    part):
+                by_archive.setdefault(archive_id, []).append(members)
+        result = {}
+        for (archive_id, postings) in sorted(by_archive.items()):
+            if len(postings) < len(grams):
+                continue    # a trigram is missing in the archive
+            seqs = None
+            for members in sorted(postings, key=len):
+                numbers = bytes_to_members(members)
+                seqs = set(numbers) if seqs is None else seqs & set(numbers)
+                if not seqs:
+                    break
+            if not seqs:
+                continue
+            (path, ) = self.connection.execute(
+                'SELECT path FROM text_archives WHERE id = ?',
+                (archive_id, )).fetchone()
+            result[path] = [
+                name for (seq, name) in self.connection.execute(
+                    'SELECT seq, name FROM text_members '
+                    'WHERE archive_id = ? ORDER BY seq', (archive_id, ))
+                if seq in seqs]
+        return result
+
+    def search(self, searcher, text=None, stale=None):
+        '''Generator of Match of searcher (see library.search) in the
+        candidate members. text: a part of every match, e.g. the literal
+        part of a regular expression, default the pattern of a literal
+        searcher. Only text members are searched.
+        Archives changed or removed since indexing are skipped and
+        reported to stale(path, reason), members missing now are skipped.
+        '''
+        if text is None and searcher.literal:
+            text = searcher.pattern
+        for (path, names) in self.candidates(text).items():
+            reason = self.check_archive(path)
+            if reason:
+                if stale:
+                    stale(path, reason)
+                continue
+            with Xmitfile(path) as xmit:
+                pds = xmit.get_pds()
+                for name in names:
+                    try:
+                        memberdata = pds.get_memberdata(name)
+                    except (KeyError, errors.NodataError):
+                        continue
+                    yield from searcher.search_memberdata(memberdata, path)
+
+    def check_archive(self, path):
+        '''None if the file in path is unchanged since indexing,
+        else the reason why not.
+        '''
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            return e.strerror or str(e)
+        row = self.connection.execute(
+            'SELECT size, mtime_ns FROM text_archives WHERE path = ?',
+            (path, )).fetchone()
+        if row != (stat.st_size, stat.st_mtime_ns):
+            return 'changed since indexing'
+        return None
+
+def get_trigrams(text):
+    '''set of the substrings of length 3 in text
+    '''
+    return {text[i: i + 3] for i in range(len(text) - 2)}
+
+def index_archives(paths, codepage='cp273', workers=None):
+    '''Generator of index_archive() results of paths,
+    indexed in a process pool unless workers == 1.
+    '''
+    if workers == 1:
+        for path in paths:
+            yield index_archive(path, codepage)
+        return
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(index_archive, path, codepage)
+            for path in paths]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+def index_archive(path, codepage='cp273'):
+    '''Reads the text members of a xmit file, see
+    stream.iter_file_members(), and returns
+        (archive, names, postings)
+    postings: dictionary trigram: bytes of the array of the numbers of
+    the members in names containing it.
+    Failures are noted in archive['error'].
+    '''
+    stat = os.stat(path)
+    archive = {
+        'path': path,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'codepage': codepage,
+        'error': None
+    }
+    names = []
+    postings = {}
+    try:
+        for (mbr, memberdata) in iter_file_members(path):
+            if memberdata.datatype != 'ebcdic':
+                continue
+            seq = len(names)
+            names.append(mbr.name.strip())
+            text = memberdata.get_text(codepage=codepage).upper()
+            for trigram in get_trigrams(text):
+                postings.setdefault(
+                    trigram, array(MEMBERS_TYPE)).append(seq)
+    except Exception as err:    # pylint: disable=broad-except
+        # corrupt archives must not stop the indexing of the library
+        archive['error'] = '{}: {}'.format(type(err).__name__, err)
+        (names, postings) = ([], {})
+    return (archive, names,
+            {trigram: members_to_bytes(members)
+             for trigram, members in postings.items()})
+
+def members_to_bytes(numbers):
+    '''array of member numbers as stored in trigrams.members
+    '''
+    if sys.byteorder != 'little':
+        numbers = array(MEMBERS_TYPE, numbers)
+        numbers.byteswap()
+    return numbers.tobytes()
+
+def bytes_to_members(the_bytes):
+    '''array of member numbers of trigrams.members
+    '''
+    numbers = array(MEMBERS_TYPE)
+    numbers.frombytes(the_bytes)
+    if sys.byteorder != 'little':
+        numbers.byteswap()
+    return numbers
@@ -1,10 +1,9 @@
 '''Frame for display of PDS directory
 '''
-from pathlib import Path
 import tkinter as tk
 from tkinter import ttk
 
-from xmitviewer.utils.errors import NodataError
+from xmitviewer.iebcopy.export import export_members
 
 #
 # Keys for dictionary of widgets and stringvars
@@ -147,26 +146,10 @@ class DirectoryFrame(ttk.Frame):    # pylint: disable=too-many-ancestors
         directory = tk.filedialog.askdirectory(initialdir='.')
         if not directory:
             return
-        directory = Path(directory)
-        for member in self.pds.members:
-            try:
-                memberdata = member.get_memberdata(self.pds)
-            except  NodataError:
-                continue
-
-            if memberdata.datatype != 'ebcdic':
-                print(f'not saved: {member.name} {memberdata.type}')
-                continue
-
-            save_path = directory / member.name.strip()
-            with open(
-                    save_path.with_suffix('.txt'),
-                    'w', 
-                    encoding='utf-8'
-                    ) as save:
-                save.writelines(
-                    memberdata.get_as_records(
-                        codepage='cp273',
-                        linesep='\n',
-                    )
-                )
+        results = export_members(
+            self.pds,
+            outdir=directory,
+            datatypes=('ebcdic', ))
+        for result in results:
+            if result.error:
+                print(f'not saved: {result.name} {result.error}')
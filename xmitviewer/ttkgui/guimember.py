@@ -6,16 +6,23 @@ from tkinter import ttk
 import tkinter.filedialog
 import tkinter.scrolledtext
 import re
+import concurrent.futures
 
-from xmitviewer.utils import dumper, errors
+from xmitviewer.utils import datatype, dumper, errors
 
 MAX_DUMPLINES = 22
+POLL_MS = 100   # how often to look for the data types of the directory
 
 CODEPAGES = {
     'ascii': 'latin-1',
     'ebcdic-de': 'cp273',
-    'ebcdic-us': 'cp037'
+    'ebcdic-us': 'cp037',
+    'ebcdic-intl': 'cp500',
+    'ebcdic-us-euro': 'cp1140',
 }
+CODEPAGES.update(
+    (codepage, codepage) for codepage in datatype.EBCDIC_CODEPAGES
+    if codepage not in CODEPAGES.values())
 STRING = re.compile(
     r'[a-zA-Z0-9!"§$%&/()=?*+\'#;:_,.<> -]{9,64}'
 )
@@ -66,6 +73,8 @@ class MemberFrame(ttk.Frame):    # pylint: disable=too-many-ancestors
         self.pds = None
         self.mdata = None
         self.display_as_text = True
+        # guesses the data types of the directory off the Tk thread
+        self.executor = concurrent.futures.ThreadPoolExecutor(1)
 
         self.stringvars[MINFO] = tk.StringVar()
         self.widgets[MINFO] = ttk.Label(
@@ -151,8 +160,11 @@ class MemberFrame(ttk.Frame):    # pylint: disable=too-many-ancestors
             self.stringvars[MINFO].set(f'{member} {self.mdata.datatype}')
             if event:
                 if self.mdata.datatype in ('ebcdic', ):
-                    self.current_codepage = 'cp273'
-                    self.widgets[SELCODEPAGE].set('ebcdic-de')
+                    # code page guessed from the member's first records
+                    self.current_codepage = self.mdata.codepage
+                    self.widgets[SELCODEPAGE].set(next(
+                        name for name, codepage in CODEPAGES.items()
+                        if codepage == self.mdata.codepage))
                     self.display_as_text = True
                 elif self.mdata.datatype in ('xmit', 'lmod'):
                     self.current_codepage = 'cp037'
@@ -168,6 +180,7 @@ class MemberFrame(ttk.Frame):    # pylint: disable=too-many-ancestors
             self.widgets[MDATA].insert(
                 '1.0',
                 get_lines_to_display(
+                    self.pds,
                     self.mdata,
                     self.current_codepage,
                     self.display_as_text
@@ -185,7 +198,10 @@ class MemberFrame(ttk.Frame):    # pylint: disable=too-many-ancestors
         self.stringvars[BUTTON0].set(new_mode)
 
     def show_directory(self, pds):
-        '''Display the directory in member data area.
+        '''Display the directory in member data area,
+        with the data type of each member in front. The data types are
+        guessed in a background thread and filled in when done, so
+        large libraries don't freeze the GUI.
         '''
         self.pds = pds
         self.stringvars[MINFO].set('--- Member List ---')
@@ -193,10 +209,31 @@ class MemberFrame(ttk.Frame):    # pylint: disable=too-many-ancestors
         self.widgets[BUTTON0].grid_remove()
         self.widgets[BUTTON1].grid_remove()
         self.widgets[SELCODEPAGE].configure(state=tk.DISABLED)
+        self.insert_directory(pds, {})
+        future = self.executor.submit(pds.get_datatypes)
+        self.after(POLL_MS, self.show_datatypes, pds, future)
+    def show_datatypes(self, pds, future):
+        '''Display the directory again with the data types of future,
+        unless another directory or a member is shown meanwhile.
+        '''
+        if self.pds is not pds or self.mdata is not None:
+            return
+        if not future.done():
+            self.after(POLL_MS, self.show_datatypes, pds, future)
+            return
+        if future.exception() is None:
+            (top, _) = self.widgets[MDATA].yview()
+            self.insert_directory(pds, future.result())
+            self.widgets[MDATA].yview_moveto(top)
+    def insert_directory(self, pds, datatypes):
+        '''Replace member data area by the directory of pds,
+        datatypes: dictionary member name: data type
+        '''
         self.widgets[MDATA].delete('1.0', tk.END)
         self.widgets[MDATA].insert(
             '1.0',
-            '\n'.join(str(s) for s in pds.members)
+            '\n'.join(f'{datatypes.get(s.name, ""):6s} {s}'
+                      for s in pds.members)
         )
     def save_to_file(self):
         '''Save member's data to a file.
@@ -216,11 +253,14 @@ class MemberFrame(ttk.Frame):    # pylint: disable=too-many-ancestors
 
         encoding = None if mode == 'wb' else 'utf-8'
         with open(fname, mode, encoding=encoding) as save:
-            save.writelines(
-                self.mdata.get_as_records(
-                    codepage=codepage,
-                    linesep=linesep)
-            )
+            if codepage is None:
+                self.mdata.write_binary(save)
+            else:
+                save.writelines(
+                    self.mdata.iter_text(
+                        codepage=codepage,
+                        linesep=linesep)
+                )
 
     def switch_dump_text(self):
         '''Switch display of memeber data from text to dump mode and
@@ -237,16 +277,17 @@ class MemberFrame(ttk.Frame):    # pylint: disable=too-many-ancestors
         self.current_codepage = new_codepage
         self.show_member_data(self.mdata.member, event=None)  # no event
 
-def get_lines_to_display(mdata, codepage, display_as_text):
+def get_lines_to_display(pds, mdata, codepage, display_as_text):
     '''returns lines of member's data
-    EBCDIC data with EBCDIC code page gets displayed as text lines.
+    EBCDIC data with EBCDIC code page gets displayed as text lines,
+    which pds keeps in its member cache.
     EBCDIC data with ASCII code page gets displayed in dump format.
     Binary data gets displayed in dump format.
     '''
     if (mdata.datatype == 'ebcdic')\
         & (codepage.startswith('cp'))\
         & display_as_text:
-        to_display = '\n'.join(mdata.get_as_records(codepage=codepage))
+        to_display = pds.get_member_text(mdata.member.name, codepage)
     elif display_as_text:
         to_display = get_strings_in_binary_data(mdata.the_bytes, codepage)
     else:
@@ -4,10 +4,11 @@ unload records
 import collections
 import struct
 ADDRESS = '>BBHIBBH'
+ADDRESS_STRUCT = struct.Struct(ADDRESS)
 Address = collections.namedtuple(
     'Address',
     'flag, m, bb, cchh, r, k, dd')
 def build_address(twelve_bytes):
     '''extracts the parts of DASD address into its parts as namedtuple
     '''
-    return Address(*struct.unpack(ADDRESS, twelve_bytes))
+    return Address(*ADDRESS_STRUCT.unpack(twelve_bytes))
@@ -1,13 +1,71 @@
 '''Module contains code to guess type of data. It declares suspectible
 characters to determine the code page and looks for eye catchers
 of standard file formats.
+
+The data type and code page are scored by one byte histogram of the
+sample against tables of the suspect bytes of each code page, built once
+per code page. With NumPy installed, classify_samples() scores many
+samples at once.
 '''
+import codecs
 import string as _string
+from collections import Counter
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 _PRINTABLE = set(' ').union(
     _string.punctuation,
     _string.ascii_letters,
     _string.digits)
 _SUSPECTS = {chr(i) for i in range(256)}.difference(_PRINTABLE)
+# national letters are no suspects when choosing the code page of
+# a text, e.g. x'4A' is Ä in cp273 but ¢ in cp037
+_TEXT_SUSPECTS = _SUSPECTS.difference(
+    chr(i) for i in range(0xC0, 0x100) if chr(i).isalpha())
+
+def _has_codec(codepage):
+    try:
+        codecs.lookup(codepage)
+    except LookupError:
+        return False
+    return True
+
+# candidates of classify_codepage(), the first one wins a tie.
+# cp1047 and cp1141 need a codec package, else they are left out.
+EBCDIC_CODEPAGES = tuple(
+    codepage for codepage in
+    ('cp273', 'cp037', 'cp500', 'cp1140', 'cp1141', 'cp1047')
+    if _has_codec(codepage))
+CODEPAGES = EBCDIC_CODEPAGES + ('latin-1', )
+
+_suspect_tables = {}
+
+def get_suspect_bytes(codepage, text=False):
+    '''bytes of the byte values, which are decoded from codepage to
+        non-printable characters, with text=True national letters are
+        printable. Built once per code page.
+    '''
+    key = (codepage, text)
+    table = _suspect_tables.get(key)
+    if table is None:
+        suspects = _TEXT_SUSPECTS if text else _SUSPECTS
+        table = bytes(
+            i for i in range(256)
+            if bytes([i]).decode(codepage, errors='replace') in suspects)
+        _suspect_tables[key] = table
+    return table
+
+def _get_printable_bytes(codepage, text=False):
+    'the byte values, which are no get_suspect_bytes()'
+    key = (codepage, text, 'printable')
+    table = _suspect_tables.get(key)
+    if table is None:
+        table = bytes(range(256)).translate(
+            None, get_suspect_bytes(codepage, text))
+        _suspect_tables[key] = table
+    return table
 
 def check_codepage(the_bytes, codepage=None):
     '''Gives number from 0 to 100 indicating the percentage of
@@ -15,10 +73,47 @@ def check_codepage(the_bytes, codepage=None):
         Small numbers indicate a text file,
         large numbers indicate a non-text file.
     '''
-    test_string = the_bytes.decode(codepage, errors='replace')
-    return len(
-        [s for s in test_string if s in _SUSPECTS]
-        ) * 100 // len(the_bytes)
+    count_suspects = len(the_bytes) - len(
+        bytes(the_bytes).translate(None, get_suspect_bytes(codepage)))
+    return count_suspects * 100 // len(the_bytes)
+
+def classify_codepage(the_bytes, codepages=CODEPAGES):
+    '''(codepage, confidence) of the code page in codepages giving
+        the fewest suspect characters for the_bytes, confidence is the
+        share of the other characters from 0.0 to 1.0.
+    '''
+    histogram = Counter(bytes(the_bytes))
+    best = (None, -1)
+    for codepage in codepages:
+        suspect_bytes = get_suspect_bytes(codepage, text=True)
+        count = sum(histogram[byte] for byte in suspect_bytes)
+        if best[0] is None or count < best[1]:
+            best = (codepage, count)
+    (codepage, count) = best
+    return (codepage, 1 - count / len(the_bytes) if the_bytes else 0.0)
+
+def classify_samples(samples):
+    '''List of classify() of each sample, with NumPy the suspect
+        characters of all samples are counted at once, as product of the
+        matrix of their histograms with the suspect tables.
+    '''
+    if numpy is None or not samples:
+        return [classify(sample) for sample in samples]
+    histograms = numpy.stack([
+        numpy.bincount(numpy.frombuffer(bytes(sample), numpy.uint8),
+                       minlength=256)
+        for sample in samples])
+    tables = numpy.zeros((256, len(_TABLES)), numpy.int64)
+    for column, (codepage, text) in enumerate(_TABLES):
+        tables[list(get_suspect_bytes(codepage, text)), column] = 1
+    counts = histograms @ tables
+    return [_decide(sample, row.tolist())
+            for sample, row in zip(samples, counts)]
+
+# suspect tables counted by classify(): cp273 and latin-1 for the data
+# type, the EBCDIC code pages with national letters for the code page
+_TABLES = (('cp273', False), ('latin-1', False)) + tuple(
+    (codepage, True) for codepage in EBCDIC_CODEPAGES)
 
 def get_type(the_bytes):
     '''
@@ -28,10 +123,43 @@ def get_type(the_bytes):
     'ascii' - Textfile ASCII
     ...
     '''
+    return classify(the_bytes)[0]
+
+def classify(the_bytes):
+    '''(data type, code page): the data type of get_type(), the code
+        page of classify_codepage() in EBCDIC_CODEPAGES for data type
+        'ebcdic', else None. Both from one histogram of the_bytes.
+        ('empty', None) without bytes.
+    '''
+    if not the_bytes:
+        return ('empty', None)
+    histogram = Counter(bytes(the_bytes))
+    present = bytes(histogram)
+    def count_suspects(codepage, text):
+        # sum the counts of the fewer ones: suspect or printable bytes
+        suspects = present.translate(
+            None, _get_printable_bytes(codepage, text))
+        printables = present.translate(
+            None, get_suspect_bytes(codepage, text))
+        if len(suspects) <= len(printables):
+            return sum(histogram[byte] for byte in suspects)
+        return len(the_bytes) - sum(histogram[byte] for byte in printables)
+    counts = [count_suspects(*table) for table in _TABLES[:2]]
+    if counts[0] * 100 // len(the_bytes) < 2:  # the code page of ebcdic
+        counts.extend(count_suspects(*table) for table in _TABLES[2:])
+    return _decide(the_bytes, counts)
+
+def _decide(the_bytes, counts):
+    '''(data type, code page) of the_bytes by counts of suspect
+        characters in the code pages of _TABLES
+    '''
+    if not the_bytes:
+        return ('empty', None)
+    if counts[0] * 100 // len(the_bytes) < 2:
+        ebcdic = counts[2:]
+        return ('ebcdic', EBCDIC_CODEPAGES[ebcdic.index(min(ebcdic))])
     resp = 'bin'
-    if check_codepage(the_bytes, codepage='cp273') < 2:
-        resp = 'ebcdic'
-    elif check_codepage(the_bytes, codepage='latin-1') < 2:
+    if counts[1] * 100 // len(the_bytes) < 2:
         resp = 'ascii'
     elif the_bytes[2:8] == 'INMR01'.encode('cp273'):
         resp = 'xmit'
@@ -41,4 +169,4 @@ def get_type(the_bytes):
         resp = 'zip'
     elif the_bytes[1:5] == 'ESD '.encode('cp273'):
         resp = 'obj'
-    return resp
+    return (resp, None)
@@ -0,0 +1,124 @@
+'''Persistent cache for the index of xmit files
+
+The index of a xmit file is a flat dictionary: values are arrays,
+bytes or json serializable data. On disk it is stored as one json
+header line followed by the binary data of the arrays and bytes.
+'''
+import hashlib
+import json
+import os
+import sys
+from array import array
+from pathlib import Path
+
+VERSION = 3
+SUFFIX = '.xmitidx'
+SIDECAR = 'sidecar'
+ENV_CACHE = 'XMITVIEWER_CACHE'
+
+def default_cache_dir():
+    '''Directory for index files: $XDG_CACHE_HOME/xmitviewer
+    '''
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'xmitviewer'
+
+def get_cache(path, location=None):
+    '''Returns Indexcache for xmit file in path or None, if no cache
+    is requested: location None takes $XMITVIEWER_CACHE,
+    'sidecar' puts the index file next to the xmit file,
+    'default' uses default_cache_dir(), any other value is
+    the directory for the index files.
+    '''
+    if location is None:
+        location = os.environ.get(ENV_CACHE)
+    if not location:
+        return None
+    if location == 'default':
+        location = default_cache_dir()
+    try:
+        return Indexcache(path, location)
+    except OSError:
+        return None
+
+class Indexcache(object):
+    '''Index file of one xmit file.
+        - .key: absolute path, size and mtime of the xmit file,
+                the index is valid only for this key.
+        - .cache_path: path of the index file
+    '''
+    def __init__(self, path, location):
+        path = Path(path).resolve()
+        stat = path.stat()
+        self.key = [str(path), stat.st_size, stat.st_mtime_ns]
+        if location == SIDECAR:
+            self.cache_path = path.with_name(path.name + SUFFIX)
+        else:
+            name = hashlib.sha1(str(path).encode('utf-8')).hexdigest()
+            self.cache_path = Path(location) / (name + SUFFIX)
+    def __repr__(self):
+        return 'Indexcache %s' % self.cache_path
+
+    def load(self):
+        '''returns the index dictionary or None,
+        if there is no valid index file
+        '''
+        try:
+            with open(self.cache_path, 'rb') as idx_file:
+                header = json.loads(idx_file.readline().decode('utf-8'))
+                if (header['version'] != VERSION
+                        or header['key'] != self.key
+                        or header['byteorder'] != sys.byteorder):
+                    return None
+                index = header['values']
+                for (name, typecode, itemsize, nbytes) in header['blobs']:
+                    data = idx_file.read(nbytes)
+                    if len(data) != nbytes:
+                        return None
+                    if typecode is None:
+                        index[name] = data
+                        continue
+                    index[name] = array(typecode)
+                    if index[name].itemsize != itemsize:
+                        return None
+                    index[name].frombytes(data)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return index
+
+    def store(self, index):
+        '''writes the index dictionary to the index file,
+        failures are ignored: the cache is only an optimization
+        '''
+        values = {}
+        blobs = []
+        data = []
+        for name, value in index.items():
+            if isinstance(value, array):
+                blobs.append((name, value.typecode, value.itemsize,
+                              len(value) * value.itemsize))
+                data.append(value.tobytes())
+            elif isinstance(value, (bytes, bytearray)):
+                blobs.append((name, None, 1, len(value)))
+                data.append(bytes(value))
+            else:
+                values[name] = value
+        header = {
+            'version': VERSION,
+            'key': self.key,
+            'byteorder': sys.byteorder,
+            'values': values,
+            'blobs': blobs
+        }
+        temp_path = self.cache_path.with_name(
+            '{}.{}.tmp'.format(self.cache_path.name, os.getpid()))
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp_path, 'wb') as idx_file:
+                idx_file.write(json.dumps(header).encode('utf-8') + b'\n')
+                idx_file.writelines(data)
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            try:
+                temp_path.unlink()
+            except OSError:
+                pass
@@ -0,0 +1,60 @@
+'''Transparent reading of xmit files shipped in containers:
+zip archives or files compressed with gzip, bzip2 or xz.
+The xmit file is decompressed on the fly, nothing is written to disk.
+'''
+import bz2
+import gzip
+import lzma
+import zipfile
+import zlib
+
+import xmitviewer.utils.errors as errors
+import xmitviewer.xmit.segment as segm
+
+ERRORS = (OSError, EOFError, lzma.LZMAError, zlib.error, zipfile.BadZipFile)
+
+def open_container(path):
+    '''Returns a readable binary stream of the xmit file in
+    the container path, None if path is no container.
+    The container type is determined by its magic bytes.
+    '''
+    with open(path, 'rb') as the_file:
+        magic = the_file.read(6)
+    if magic.startswith(b'PK\x03\x04'):
+        return open_zip_entry(path)
+    if magic.startswith(b'\x1f\x8b'):
+        return gzip.open(path, 'rb')
+    if magic.startswith(b'BZh'):
+        return bz2.open(path, 'rb')
+    if magic.startswith(b'\xfd7zXZ\x00'):
+        return lzma.open(path, 'rb')
+    return None
+
+def open_zip_entry(path):
+    '''Returns stream of the first entry in zip archive path,
+    which is a xmit file.
+    '''
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as err:
+        raise errors.XmitfileError('Invalid zip archive: {}'.format(err))
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            with archive.open(info) as entry:
+                if entry.read(8)[1:] != segm.XMIT_START:
+                    continue
+            return archive.open(info)
+    raise errors.XmitfileError('No xmit file found in zip archive')
+
+def read_all(stream):
+    '''Reads and closes the stream from open_container(),
+    decompression failures raise XmitfileError.
+    '''
+    with stream:
+        try:
+            return stream.read()
+        except ERRORS as err:
+            raise errors.XmitfileError(
+                'Decompression failed: {}'.format(err))
@@ -1,14 +1,18 @@
 '''Only one class: Dataset, see doc there
 '''
+import xmitviewer.xmit.recordtable as recordtable
+
 class Dataset(object):
     '''This class describes a MVS data set contained inside xmit file
     data from text units in control record INMR02
      - .dsn - Dataset Name of xmitted file
      - .utiln - Name of Utility used (e.g. IEBCOY)
      - .dcb - some DCB attributes
-     - .datarecords - list of datarecords, initially empty
+     - .datarecords - Recordview of the datarecords in the
+                      Recordtable of the xmit file, initially empty
+                      (stays empty without table)
     '''
-    def __init__(self, tu_list):
+    def __init__(self, tu_list, table=None):
         '''extract relevant TUs from data control record
         '''
         tunits = {}
@@ -22,20 +26,21 @@ class Dataset(object):
         self.dcb['lrecl'] = tunits.get('LRECL', 0)
         self.dcb['dsorg'] = tunits.get('DSORG', '?')
         self.dcb['blksz'] = tunits.get('BLKSZ', 0)
-        self.datarecords = []
+        self.datarecords = recordtable.Recordview(table)
 
     def __repr__(self):
         return 'Data Set %r mit %r, DCB %r' % (self.dsn, self.utiln, self.dcb)
 
-    def add_datarecord(self, datarecord):
-        '''Used by Class Xmitfile during scan of xmit file
+    def add_datarecord(self, row):
+        '''Used by Class Xmitfile during scan of xmit file:
+        row is the index of the data record in the Recordtable
         '''
-        self.datarecords.append(datarecord)
+        self.datarecords.append(row)
 
     def dump_datarecords(self, index_list):
         '''Dump of selected datarecords
             Example: Dump records from index 2 to 4:
-                dump_datarecords(range(2:5))
+                dump_datarecords(range(2, 5))
         '''
         for i in index_list:
             self.datarecords[i].dump()
@@ -1,8 +1,13 @@
 '''This module contains the starting object: Xmitfile
 '''
+import mmap
+
 import xmitviewer.utils.errors as errors
+import xmitviewer.utils.indexcache as indexcache
+import xmitviewer.xmit.container as container
 import xmitviewer.xmit.controlrecord as cntl
 import xmitviewer.xmit.dataset as dataset
+import xmitviewer.xmit.recordtable as recordtable
 import xmitviewer.xmit.segment as segm
 import xmitviewer.iebcopy.iebcopyds as ieb
 
@@ -20,86 +25,302 @@ class Xmitfile(object):
        contains one or multiple data sets.
 
        Attributes:
-       - .path - path of Xmitfile
+       - .path - path of Xmitfile, or name of other source
+       - .mapping - the memory mapped file, None if use_mmap=False
+       - .records - Recordtable of all records (control and data)
        - .controlrecords - List of the control records
        - .datasets - list of its datasets (INMR02 records), usually two.
+       - .depth - nesting level, 0 unless opened by open_member()
        - .get_pds() - method, giving the pds object.
 
+       The source is a path, bytes, bytearray, memoryview or a
+       readable binary file object. A path gets memory mapped with
+       use_mmap=True (default) or read into memory with use_mmap=False.
+       If the path is a zip archive or compressed by gzip, bzip2 or xz,
+       the whole xmit file gets decompressed into memory. To read the
+       members once without that, see stream.iter_file_members().
+       The scan only notes position and length of the records in
+       the Recordtable, their data gets assembled on demand.
+
+       close() releases the memory mapping, also at the end of a with
+       block:
+           with Xmitfile(path) as xmit:
+               pds = xmit.get_pds()
+
+       index_cache: keep the results of the scan in an index file, so
+       opening the unchanged file again skips the scan, see
+       utils.indexcache.get_cache() for the possible values.
+       Only used if source is a path.
+
        See Documentation in TSO Customization
     '''
-    def __init__(self, path):
-        def next_segment():
-            '''little helper to iterate over the segments
-            '''
-            while True:
-                if xmit_file.tell() < file_size:
-                    yield segm.Segmentgroup(xmit_file)
-                else:
-                    return
-
-        self.path = path
+    def __init__(self, source, use_mmap=True, index_cache=None,
+                 name=None, depth=0):
+        self.mapping = None
         self.controlrecords = []
         self.datasets = []
+        self.depth = depth
         self._layout = []
+        self._pds = None
+        self._cache = None
 
-        with open(path, 'rb') as xmit_file:
-            xmit_start = xmit_file.read(8)
-            if xmit_start[1:] != bytes.fromhex('e0 c9d5 d4d9 f0f1'):
-                raise errors.XmitfileError('INMR01 Record missing')
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self.path = name or '<memory>'
+            buffer = source
+        elif hasattr(source, 'read'):
+            self.path = name or getattr(source, 'name', '<stream>')
+            buffer = source.read()
+        else:
+            self.path = name or source
+            stream = container.open_container(source)
+            if stream is not None:
+                buffer = container.read_all(stream)
+            else:
+                with open(source, 'rb') as xmit_file:
+                    if use_mmap and xmit_file.read(1):
+                        self.mapping = mmap.mmap(
+                            xmit_file.fileno(), 0, access=mmap.ACCESS_READ)
+                        buffer = self.mapping
+                    else:
+                        xmit_file.seek(0)
+                        buffer = xmit_file.read()
+            self._cache = indexcache.get_cache(source, index_cache)
+        if bytes(buffer[1:8]) != segm.XMIT_START:
+            raise errors.XmitfileError('INMR01 Record missing')
+        self.records = recordtable.Recordtable(buffer)
+
+        self._index = self._cache.load() if self._cache else None
+        if self._index:
+            self._restore()
+        else:
+            self._scan()
+            if self._cache:
+                self._index = self.get_index()
+                self._cache.store(self._index)
 
-            file_size = xmit_file.seek(0, 2) # EOF
-            xmit_file.seek(0) # wieder nach vorne gehen
-            count_datarecords = 0
-            sum_datalen = 0
-            (cur_dataset, first_in_group) = (None, True)
-            for seg in next_segment():
-                if seg.header.is_controlrecord:
-                    if count_datarecords > 0:
-                        self._layout.append(" DataRecords %r - %r bytes"
-                                            % (count_datarecords, sum_datalen))
-                        count_datarecords = 0
-                    crec = cntl.Controlrecord(seg)
-                    self.controlrecords.append(crec)
-                    self._layout.append(" %s  %s%s" % (
-                        crec.type,
-                        '<' if seg.header.is_first_seg_in_rec else '.',
-                        '>' if seg.header.is_last_seg_in_rec else '.',
-                        ))
-                    if  crec.type == 'INMR02':
-                        dsn = dataset.Dataset(crec.tu_list)
-                        self.datasets.append(dsn)
-                        if first_in_group:
-                            first_in_group = False
-                            cur_dataset = dsn
-
-                else:
-                    sum_datalen += len(seg.the_bytes)
-                    count_datarecords += 1
-                    cur_dataset.add_datarecord(seg)
+    def _scan(self):
+        '''Scan the segments and fill the Recordtable
+        '''
+        count_datarecords = 0
+        sum_datalen = 0
+        (cur_dataset, first_in_group) = (None, True)
+        for (file_pos, length, count_segs, is_controlrecord) in\
+                segm.scan_records(self.records.buffer):
+            row = self.records.append(
+                file_pos, length, count_segs, is_controlrecord)
+            if is_controlrecord:
+                if count_datarecords > 0:
+                    self._layout.append(" DataRecords %r - %r bytes"
+                                        % (count_datarecords, sum_datalen))
+                    count_datarecords = 0
+                crec = cntl.Controlrecord(self.records[row])
+                self.controlrecords.append(crec)
+                self._layout.append(" %s  %s>" % (
+                    crec.type,
+                    '<' if count_segs == 1 else '.',
+                    ))
+                if  crec.type == 'INMR02':
+                    dsn = dataset.Dataset(crec.tu_list, self.records)
+                    self.datasets.append(dsn)
+                    if first_in_group:
+                        first_in_group = False
+                        cur_dataset = dsn
+                elif crec.type == 'INMR06':
+                    break   # end of transmission, ignore padding
+
+            else:
+                sum_datalen += length
+                count_datarecords += 1
+                cur_dataset.add_datarecord(row)
+
+    def _restore(self):
+        '''Fill the Recordtable from the index file,
+        only the control records get parsed again.
+        '''
+        self.records.load_index({
+            name[len('records.'):]: value
+            for name, value in self._index.items()
+            if name.startswith('records.')})
+        flags = self.records.flags.tobytes()
+        row = flags.find(1)
+        while row >= 0:
+            crec = cntl.Controlrecord(self.records[row])
+            self.controlrecords.append(crec)
+            if  crec.type == 'INMR02':
+                self.datasets.append(
+                    dataset.Dataset(crec.tu_list, self.records))
+            row = flags.find(1, row + 1)
+        for i, dsn in enumerate(self.datasets):
+            dsn.datarecords.rows = self._index['datasets.{}.rows'.format(i)]
+        self._layout = self._index['layout']
+
+    def get_index(self):
+        '''Dictionary with the results of the scan for the Indexcache
+        '''
+        index = {
+            'records.' + name: value
+            for name, value in self.records.get_index().items()}
+        for i, dsn in enumerate(self.datasets):
+            index['datasets.{}.rows'.format(i)] = dsn.datarecords.rows
+        index['layout'] = self._layout
+        if self._pds:
+            index.update(
+                ('pds.' + name, value)
+                for name, value in self._pds.get_index().items())
+        return index
 
     def __repr__(self):
         '''Simple print of XMIT file's layout
         '''
-        return self.path + '\n' + '\n'.join(self._layout)
+        return str(self.path) + '\n' + '\n'.join(self._layout)
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
+    def close(self):
+        '''Releases the memory mapping, the records and the pds of this
+        file can't be read any more. If views of the mapping are still
+        referenced elsewhere, e.g. a Memberdata of get_pds(), the file
+        gets unmapped when they are freed.
+        '''
+        if self.mapping is None:
+            return
+        (mapping, self.mapping) = (self.mapping, None)
+        self._pds = None
+        self.records.buffer = b''
+        try:
+            mapping.close()
+        except BufferError:
+            pass    # exported views, unmapped by the garbage collector
     def get_pds(self):
         '''returns PDS file object found in XMIT file_size
            raises TypeError if not found
         '''
         if self.datasets[0].utiln != 'IEBCOPY':
             raise errors.XmitfileError('No PDS found in XMIT File')
-        return ieb.Iebcopyds(self.datasets[0])
+        if self._pds is None:
+            pds_index = {
+                name[len('pds.'):]: value
+                for name, value in (self._index or {}).items()
+                if name.startswith('pds.')}
+            self._pds = ieb.Iebcopyds(self.datasets[0], index=pds_index)
+            if self._cache and not pds_index:
+                self._index = self.get_index()
+                self._cache.store(self._index)
+        return self._pds
     def get_inmr01(self):
         '''Short info from INMR01:
         FROMNODE.FROMUID FTIME (as yyyy-mm-dd)
         '''
-        inmr01 = self.controlrecords[0]
-        textunits = dict(
-            (textunit.field, textunit.data[0]) for textunit in inmr01.tu_list
+        return inmr01_info(self.controlrecords[0])
+
+    def open_member(self, mbrname):
+        '''Opens the data of a pds member, which is itself a xmit file,
+        as Xmitfile without writing it to a temporary file.
+        Raises XmitfileError if the member contains no xmit file.
+        '''
+        memberdata = self.get_pds().get_memberdata(mbrname)
+        if memberdata.datatype != 'xmit':
+            raise errors.XmitfileError(
+                'Member {} contains no xmit file'.format(mbrname.strip()))
+        return self._open_memberdata(memberdata)
+
+    def _open_memberdata(self, memberdata):
+        '''Xmitfile of the data of a member containing a xmit file
+        '''
+        return Xmitfile(
+            b''.join(memberdata.get_as_records(codepage=None)),
+            name='{}({})'.format(self.path, memberdata.member.name.strip()),
+            depth=self.depth + 1)
+
+    def iter_nested(self, max_depth=None):
+        '''Generator of the xmit files nested in members of the pds,
+        depth first in physical order of the members and recursively
+        up to max_depth levels below this one.
+        '''
+        if max_depth is not None and max_depth <= 0:
+            return
+        if not self.datasets or self.datasets[0].utiln != 'IEBCOPY':
+            return
+        for (_, memberdata) in self.get_pds().iter_members():
+            if memberdata.datatype != 'xmit':
+                continue
+            try:
+                nested = self._open_memberdata(memberdata)
+            except errors.XmitfileError:
+                continue
+            yield nested
+            yield from nested.iter_nested(
+                None if max_depth is None else max_depth - 1)
+
+class Xmitheader(object):
+    '''The control records in front of the first data record
+       of a XMIT file, see probe().
+
+       Attributes:
+       - .path - path of Xmitfile
+       - .controlrecords - List of these control records
+       - .inmr01 - dictionary of the text units in INMR01,
+            e.g. FNODE, FUID, FTIME
+       - .datasets - list of its datasets (INMR02 records)
+            without data records.
+    '''
+    def __init__(self, path, controlrecords):
+        self.path = path
+        self.controlrecords = controlrecords
+        self.inmr01 = dict(
+            (textunit.field, textunit.data[0])
+            for textunit in controlrecords[0].tu_list
             if len(textunit.data) == 1)
-        its_date = list(textunits.get('FTIME', 'yyyymmdd')[:8])
-        its_date.insert(6, '-')
-        its_date.insert(4, '-')
-        return 'INMR01: {}.{} - {}'.format(
-            textunits.get('FNODE', '<FNODE>'),
-            textunits.get('FUID', '<FUID>'),
-            ''.join(its_date))
+        self.datasets = [
+            dataset.Dataset(crec.tu_list)
+            for crec in controlrecords if crec.type == 'INMR02']
+    def __repr__(self):
+        return '{} {}\n{}'.format(
+            self.path,
+            self.get_inmr01(),
+            '\n'.join(' ' + repr(dsn) for dsn in self.datasets))
+    def get_inmr01(self):
+        '''Short info from INMR01, see Xmitfile.get_inmr01()
+        '''
+        return inmr01_info(self.controlrecords[0])
+
+def probe(path):
+    '''Reads only the control records up to the first data record and
+    returns them as Xmitheader. Much cheaper than Xmitfile(path), if
+    only INMR01 and the data set descriptions in INMR02 are needed.
+    '''
+    controlrecords = []
+    stream = container.open_container(path) or open(path, 'rb')
+    with stream as xmit_file:
+        first_header = xmit_file.read(2)
+        if first_header[1:] != segm.XMIT_START[:1]:
+            raise errors.XmitfileError('INMR01 Record missing')
+        while len(first_header) == 2 and first_header[1] & (1<<5):
+            try:
+                controlrecords.append(cntl.Controlrecord(
+                    segm.Segmentgroup(xmit_file, first_header)))
+            except EOFError:
+                raise errors.XmitfileError('truncated control record')
+            if controlrecords[0].type != 'INMR01':
+                raise errors.XmitfileError('INMR01 Record missing')
+            first_header = xmit_file.read(2)
+        if len(first_header) != 2 and controlrecords[-1].type != 'INMR06':
+            # the file ends before the data and the trailer INMR06
+            raise errors.XmitfileError('truncated control record')
+    return Xmitheader(path, controlrecords)
+
+def inmr01_info(inmr01):
+    '''Short info from control record INMR01:
+    FROMNODE.FROMUID FTIME (as yyyy-mm-dd)
+    '''
+    textunits = dict(
+        (textunit.field, textunit.data[0]) for textunit in inmr01.tu_list
+        if len(textunit.data) == 1)
+    its_date = list(textunits.get('FTIME', 'yyyymmdd')[:8])
+    its_date.insert(6, '-')
+    its_date.insert(4, '-')
+    return 'INMR01: {}.{} - {}'.format(
+        textunits.get('FNODE', '<FNODE>'),
+        textunits.get('FUID', '<FUID>'),
+        ''.join(its_date))
@@ -0,0 +1,175 @@
+'''Compact table of the records (segment groups) in a xmit file.
+
+Instead of one object per record, the records are described by
+array-backed columns. The data of a record gets assembled from the
+underlying buffer (mmap or bytes) only on demand.
+'''
+from array import array
+
+import xmitviewer.utils.dumper as dumper
+
+class Recordtable(object):
+    '''Columns describing the records found in buffer:
+        - .offsets: file position of first segment
+        - .lengths: length of assembled record (without segment headers)
+        - .counts: count of segments in record
+        - .flags: 1 for control records, 0 for data records
+
+        table[i] gives a Record object, table.get_bytes(i) the data.
+    '''
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.offsets = array('Q')
+        self.lengths = array('L')
+        self.counts = array('L')
+        self.flags = array('B')
+    def __repr__(self):
+        return 'Recordtable of %d records, %d bytes' % (
+            len(self), sum(self.lengths))
+    def __len__(self):
+        return len(self.offsets)
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [Record(self, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('record index out of range')
+        return Record(self, i)
+    def append(self, offset, length, count_segs, is_controlrecord):
+        '''Used by Class Xmitfile during scan of xmit file
+        '''
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.counts.append(count_segs)
+        self.flags.append(1 if is_controlrecord else 0)
+        return len(self.offsets) - 1
+    def get_index(self):
+        '''the columns as dictionary, e.g. for an Indexcache
+        '''
+        return {
+            'offsets': self.offsets,
+            'lengths': self.lengths,
+            'counts': self.counts,
+            'flags': self.flags
+        }
+    def load_index(self, index):
+        '''restores the columns from get_index()
+        '''
+        self.offsets = index['offsets']
+        self.lengths = index['lengths']
+        self.counts = index['counts']
+        self.flags = index['flags']
+    def is_controlrecord(self, i):
+        'True if record i is a control record'
+        return self.flags[i] == 1
+    def get_pieces(self, i):
+        '''list of (offset, length) of the segment data of record i
+        '''
+        pieces = []
+        pos = self.offsets[i]
+        for _ in range(self.counts[i]):
+            laenge = self.buffer[pos]
+            pieces.append((pos + 2, laenge - 2))
+            pos += laenge
+        return pieces
+    def get_view(self, i):
+        '''memoryview of record i in buffer,
+        None if the record spans more than one segment
+        '''
+        if self.counts[i] > 1:
+            return None
+        offset = self.offsets[i] + 2
+        return memoryview(self.buffer)[offset: offset + self.lengths[i]]
+    def get_data(self, i):
+        '''the data of record i: memoryview of the buffer, if the record
+        is a single segment, else the bytes assembled from its segments
+        '''
+        view = self.get_view(i)
+        return self.get_bytes(i) if view is None else view
+    def get_bytes(self, i):
+        '''the data of record i assembled from its segments
+        '''
+        if self.counts[i] == 1:
+            offset = self.offsets[i] + 2
+            return bytes(self.buffer[offset: offset + self.lengths[i]])
+        return b''.join(
+            self.buffer[offset: offset + length]
+            for (offset, length) in self.get_pieces(i))
+
+class Recordview(object):
+    '''Selection of rows of a Recordtable, e.g. the data records of
+    a data set. Indexing works by position in the selection.
+    '''
+    def __init__(self, table):
+        self.table = table
+        self.rows = array('L')
+    def __repr__(self):
+        return 'Recordview of %d records' % len(self)
+    def __len__(self):
+        return len(self.rows)
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [Record(self.table, row) for row in self.rows[i]]
+        return Record(self.table, self.rows[i])
+    def append(self, row):
+        'add row of table to the selection'
+        self.rows.append(row)
+    def get_pieces(self, i):
+        'see Recordtable.get_pieces()'
+        return self.table.get_pieces(self.rows[i])
+    def get_view(self, i):
+        'see Recordtable.get_view()'
+        return self.table.get_view(self.rows[i])
+    def get_data(self, i):
+        'see Recordtable.get_data()'
+        return self.table.get_data(self.rows[i])
+    def get_bytes(self, i):
+        'see Recordtable.get_bytes()'
+        return self.table.get_bytes(self.rows[i])
+
+class Record(object):
+    '''Accessor of a single row in a Recordtable
+        - .file_pos, .count_segs, .is_controlrecord
+        - .view: memoryview, if single segment record
+        - .the_bytes: assembled on every access
+    '''
+    __slots__ = ('table', 'row')
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+    def __repr__(self):
+        return 'SegGroup of %3d, %5d bytes, starting at pos +%r' % (
+            self.count_segs, len(self), self.file_pos)
+    def __len__(self):
+        return self.table.lengths[self.row]
+    @property
+    def file_pos(self):
+        'file position of first segment'
+        return self.table.offsets[self.row]
+    @property
+    def count_segs(self):
+        'count of segments'
+        return self.table.counts[self.row]
+    @property
+    def is_controlrecord(self):
+        'True for control records'
+        return self.table.is_controlrecord(self.row)
+    @property
+    def pieces(self):
+        'list of (offset, length) of the segment data'
+        return self.table.get_pieces(self.row)
+    @property
+    def view(self):
+        'memoryview of the data, None if record spans several segments'
+        return self.table.get_view(self.row)
+    @property
+    def the_bytes(self):
+        'the data of all segments as bytes'
+        return self.table.get_bytes(self.row)
+    def dump(self):
+        '''print the record in dump format
+        '''
+        print(repr(self))
+        for line in dumper.Dumper(codepage='cp273')(self.the_bytes):
+            print(line)
@@ -1,6 +1,11 @@
 '''Module containing code to assemble
     segments in xmit file to segment groups
 '''
+import xmitviewer.utils.errors as errors
+
+# flags of the first segment header and record type 'INMR01' in cp037
+XMIT_START = bytes.fromhex('e0 c9d5 d4d9 f0f1')
+
 class Segmentgroup(object):
     '''describes the union of all segments
        within a group of segments
@@ -9,20 +14,67 @@ class Segmentgroup(object):
         - segments_bytes: concatenated bytes of all parts without
                           their headers
         - count_segs: count of segment parts
+       Raises EOFError, if the file ends within the group.
     '''
-    def __init__(self, opened_file):
-        self.file_pos = opened_file.tell()
-        self.header = Segmentheader(opened_file.read(2), self.file_pos)
-        self.the_bytes = opened_file.read(self.header.laenge - 2)
+    def __init__(self, opened_file, first_header=None):
+        '''first_header: the two bytes of the first segment header,
+           if already read from opened_file.
+        '''
+        if first_header is None:
+            self.file_pos = opened_file.tell()
+            first_header = read_exact(opened_file, 2)
+        else:
+            self.file_pos = opened_file.tell() - 2
+        self.header = Segmentheader(first_header, self.file_pos)
+        parts = [read_exact(opened_file, self.header.laenge - 2)]
         # if more segments in record read on
         self.count_segs = 1
         while not self.header.is_last_seg_in_rec:
-            self.header = Segmentheader(opened_file.read(2), opened_file.tell())
-            self.the_bytes += opened_file.read(self.header.laenge - 2)
+            self.header = Segmentheader(
+                read_exact(opened_file, 2), opened_file.tell())
+            parts.append(read_exact(opened_file, self.header.laenge - 2))
             self.count_segs += 1
+        self.the_bytes = parts[0] if len(parts) == 1 else b''.join(parts)
     def __repr__(self):
         return 'SegGroup of %3d, %5d bytes, starting at pos +%r' % (
             self.count_segs, len(self.the_bytes), self.file_pos)
+    def __len__(self):
+        return len(self.the_bytes)
+
+def read_exact(opened_file, size):
+    '''size bytes read from opened_file, EOFError if it ends before
+    '''
+    the_bytes = opened_file.read(size)
+    if len(the_bytes) != size:
+        raise EOFError('%d of %d bytes read' % (len(the_bytes), size))
+    return the_bytes
+
+def scan_records(buffer, pos=0):
+    '''Generator of the segment groups in a buffer holding a xmit file,
+    e.g. a memory mapped file. Only the segment headers are examined,
+    the data is not copied. Yields tuples
+        (file_pos, length, count_segs, is_controlrecord)
+    with length of the record without segment headers.
+    '''
+    size = len(buffer)
+    while pos < size:
+        file_pos = pos
+        (length, count_segs) = (0, 0)
+        while True:
+            laenge = buffer[pos]
+            flags = buffer[pos + 1] if pos + 1 < size else 0
+            if laenge < 2 or pos + laenge > size:
+                raise errors.XmitfileError(
+                    'Invalid segment at offset {}'.format(pos))
+            length += laenge - 2
+            count_segs += 1
+            pos += laenge
+            if flags & (1<<6): # last segment in record
+                break
+            if pos >= size:
+                raise errors.XmitfileError(
+                    'Last segment missing at offset {}'.format(pos))
+        yield (file_pos, length, count_segs, flags & (1<<5) > 0)
 
 class Segmentheader(object):
     '''Beschreibt den Segment Header
@@ -0,0 +1,160 @@
+'''Single pass reading of a xmit file from a stream, which needs
+not be seekable, e.g. stdin or a pipe from a decompressor or a tape
+reading tool.
+
+iter_file_members() reads the pds of xmit files in containers (zip,
+gzip, bzip2, xz) this way, straight from the decompression stream.
+'''
+import itertools
+from collections import namedtuple
+
+import xmitviewer.utils.errors as errors
+import xmitviewer.xmit.container as container
+import xmitviewer.xmit.controlrecord as cntl
+import xmitviewer.xmit.dataset as dataset
+import xmitviewer.xmit.segment as segm
+import xmitviewer.iebcopy.iebcopyds as ieb
+from xmitviewer.xmit.file import Xmitfile
+
+INMR06 = 'INMR06'.encode('cp273')
+# assembled record as expected by Controlrecord
+Segmentdata = namedtuple('Segmentdata', 'the_bytes')
+
+class Xmitstream(object):
+    '''Reads the xmit file in stream once, segment by segment.
+       The end of the data is detected by a short read.
+       Only the record being assembled is held in memory.
+
+       Attributes, filled while reading:
+       - .path - name of the stream
+       - .controlrecords - List of the control records read so far
+       - .datasets - list of its datasets (INMR02 records),
+                     without data records.
+
+       Example:
+           xmit = Xmitstream(sys.stdin.buffer)
+           for (member, memberdata) in xmit.iter_members():
+               ...
+    '''
+    def __init__(self, stream, name=None):
+        self.stream = stream
+        self.path = name or getattr(stream, 'name', '<stream>')
+        self.controlrecords = []
+        self.datasets = []
+        self._started = False
+    def __repr__(self):
+        return '{} {} control records'.format(
+            self.path, len(self.controlrecords))
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
+    def close(self):
+        'close the stream'
+        self.stream.close()
+
+    def read_exact(self, size):
+        '''Read size bytes, pipes may return less on a single read.
+        Returns less than size bytes only at the end of the stream.
+        Decompression failures raise XmitfileError.
+        '''
+        try:
+            data = self.stream.read(size)
+            while data and len(data) < size:
+                more = self.stream.read(size - len(data))
+                if not more:
+                    break
+                data += more
+        except container.ERRORS as err:
+            raise errors.XmitfileError(
+                'Decompression failed: {}'.format(err))
+        return data
+
+    def iter_records(self):
+        '''Generator of (is_controlrecord, the_bytes) of the records
+        up to INMR06 or the end of the stream. Only one pass possible.
+        '''
+        if self._started:
+            raise errors.XmitfileError('Stream has already been read')
+        self._started = True
+        first_segment = True
+        while True:
+            parts = []
+            while True:
+                header = self.read_exact(2)
+                if len(header) < 2:
+                    if parts or first_segment:
+                        raise errors.XmitfileError('Unexpected end of data')
+                    return
+                if first_segment and header[1:] != segm.XMIT_START[:1]:
+                    raise errors.XmitfileError('INMR01 Record missing')
+                first_segment = False
+                seg = segm.Segmentheader(header, None)
+                if seg.laenge < 2:
+                    raise errors.XmitfileError('Invalid segment length')
+                data = self.read_exact(seg.laenge - 2)
+                if len(data) < seg.laenge - 2:
+                    raise errors.XmitfileError('Unexpected end of data')
+                parts.append(data)
+                if seg.is_last_seg_in_rec:
+                    break
+            the_bytes = parts[0] if len(parts) == 1 else b''.join(parts)
+            yield (seg.is_controlrecord, the_bytes)
+            if seg.is_controlrecord and the_bytes[:6] == INMR06:
+                return  # INMR06: end of transmission
+
+    def iter_datarecords(self):
+        '''Generator of the data records (bytes), parses the
+        control records on the way.
+        '''
+        for (is_controlrecord, the_bytes) in self.iter_records():
+            if not is_controlrecord:
+                yield the_bytes
+                continue
+            crec = cntl.Controlrecord(Segmentdata(the_bytes))
+            if not self.controlrecords and crec.type != 'INMR01':
+                raise errors.XmitfileError('INMR01 Record missing')
+            self.controlrecords.append(crec)
+            if crec.type == 'INMR02':
+                self.datasets.append(dataset.Dataset(crec.tu_list))
+
+    def iter_members(self):
+        '''Generator of (member, Memberdata) of the pds in physical order,
+        each member as soon as its data has been read.
+        Raises XmitfileError, if the xmit file contains no pds.
+        '''
+        datarecords = self.iter_datarecords()
+        first = next(datarecords, None)
+        if first is None or not self.datasets:
+            raise errors.XmitfileError('No data found in XMIT File')
+        if self.datasets[0].utiln != 'IEBCOPY':
+            raise errors.XmitfileError('No PDS found in XMIT File')
+        yield from ieb.gen_members(
+            self.datasets[0],
+            itertools.chain([first], datarecords))
+
+def iter_file_members(path):
+    '''Generator of (member, Memberdata) of the pds in the xmit file
+    path in physical order, aliases attached to their member like
+    Iebcopyds.iter_members(). Nothing if the xmit file contains no pds.
+    A container is decompressed while reading it once by Xmitstream,
+    only one member is held in memory. Other files are memory mapped
+    by Xmitfile.
+    '''
+    stream = container.open_container(path)
+    if stream is None:
+        with Xmitfile(path) as xmit:
+            if xmit.datasets and xmit.datasets[0].utiln == 'IEBCOPY':
+                yield from xmit.get_pds().iter_members()
+        return
+    with Xmitstream(stream, name=str(path)) as xmit:
+        aliases = []    # of the last member, they follow it
+        try:
+            for (mbr, memberdata) in xmit.iter_members():
+                if not any(mbr is alias for alias in aliases):
+                    aliases = mbr.aliases
+                    yield (mbr, memberdata)
+        except errors.XmitfileError:
+            if xmit.datasets and xmit.datasets[0].utiln != 'IEBCOPY':
+                return
+            raise